@@ -1,11 +1,9 @@
 import streamlit as st
-import PyPDF2
-import openai
-import os
-import pandas as pd
-from dotenv import load_dotenv
-from datetime import datetime
-from collections import defaultdict
+import html
+import importlib
+import threading
+import time
+from datetime import date, datetime, timedelta
 
 # --- Branding/Config ---
 COUNCIL_NAME = "Wyndham City Council"
@@ -16,6 +14,26 @@ SUPPORT_EMAIL = "civreplywyndham@gmail.com"
 
 st.set_page_config(page_title="PolicySimplify AI", page_icon="✅", layout="centered")
 
+# pandas, SQLAlchemy and the app's own modules take well over a second to import on a cold
+# container. The login screen needs none of them: they are imported below the PIN check, and
+# preloaded on a background thread while the login screen is showing.
+APP_MODULES = ("pandas", "db", "cache", "llm", "jobs", "retrieval", "search", "deadlines", "dashboard", "store", "exports", "metrics")
+
+@st.cache_resource(show_spinner=False)
+def preload_app_modules():
+    def load():
+        start = time.perf_counter()
+        for name in APP_MODULES:
+            importlib.import_module(name)
+        from metrics import record
+        # Charged to this app's council so it shows in Usage Analytics, which filters by council
+        record("startup", (time.perf_counter() - start) * 1000, council=COUNCIL_NAME)
+    thread = threading.Thread(target=load, name="preload-app-modules", daemon=True)
+    thread.start()
+    return thread
+
+preload_app_modules()
+
 # --- PIN LOGIN ---
 if "authenticated" not in st.session_state:
     st.session_state["authenticated"] = False
@@ -90,6 +108,19 @@ if not st.session_state["authenticated"]:
     login_screen()
     st.stop()
 
+import pandas as pd
+from db import create_db
+from cache import cache_stats, file_sha256
+from llm import ai_chat
+from jobs import enqueue_file, list_jobs, ACTIVE_STATUSES
+from retrieval import PolicyIndex, load_doc_indexes
+from search import search_policies, matching_obligations, SEARCH_PAGE_SIZE
+from deadlines import classify_deadlines, REMINDER_LIMIT
+from dashboard import CARD_CSS, CARDS_PER_PAGE, STATUS_FILTERS, DEADLINE_BUCKETS, filter_cards, group_similar, render_cards
+from store import document_keys, list_documents, obligation_frame, audit_frame, audit_chunks, data_version
+from exports import FORMATS, EXPORT_CHUNK_ROWS, frame_chunks, read_export
+from metrics import span, flush_metrics, metrics_frame, stage_percentiles, stage_count
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.markdown(
@@ -134,7 +165,7 @@ with st.sidebar:
 st.markdown("""
 <style>
 .hero-card {
-  background: linear-gradient(90deg, #1966b2 0%, #44bbff 100%);
+  background: linear-gradient(90deg, #1966b2 0%%, #44bbff 100%%);
   color: #fff;
   border-radius: 30px;
   box-shadow: 0 4px 24px #1966b230;
@@ -202,186 +233,236 @@ st.markdown("""
 uploaded_files = st.file_uploader("", type=["pdf"], accept_multiple_files=True, label_visibility="collapsed")
 st.markdown("---")
 
-# --- API Keys ---
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
-
 # --- Session State ---
 for k, v in {
-    'obligations': {}, 'audit_log': [], 'search_text': "",
-    'recent_uploads': [], 'usage': defaultdict(int)
+    'search_text': "", 'queued_jobs': {}, 'checked_uploads': set()
 }.items():
     if k not in st.session_state: st.session_state[k] = v
 
-def extract_pdf_text(pdf_file):
-    pdf_reader = PyPDF2.PdfReader(pdf_file)
-    return "".join([page.extract_text() or "" for page in pdf_reader.pages])
-
-def ai_summarize(text):
-    prompt = f"""
-You are a compliance AI assistant for Australian councils.
-Given the following policy document, provide:
-
-1. A plain-English summary (3-5 sentences).
-2. A bullet-point list of every compliance obligation, including:
-   - What must be done
-   - Deadline (if any)
-   - Who is responsible (if possible)
-   - If no deadline, suggest one if appropriate (e.g., "every year", "within 30 days")
-Format your response as:
-Summary:
-...
-Obligations:
-- Obligation (deadline, responsible)
-- ...
-Policy text:
-\"\"\"
-{text[:5000]}
-\"\"\"
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=700
-    )
-    return response.choices[0].message.content.strip()
-
-def ai_chat(query, all_policy_text):
-    prompt = f"""
-You are a helpful AI compliance assistant. Here is the combined text of all policies uploaded:
-
-\"\"\"{all_policy_text[:6000]}\"\"\"
-
-Answer this council staff question using ONLY the info above. If unsure, say "Not specified in current policies."
-
-Question: {query}
-"""
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=400
-    )
-    return response.choices[0].message.content.strip()
-
-def get_deadline_color(deadline_str):
-    if not deadline_str: return "#eaf3fa"
-    try:
-        if "within" in deadline_str or "every" in deadline_str:
-            return "#f3c852"
-        date = pd.to_datetime(deadline_str, errors="coerce")
-        if pd.isnull(date): return "#eaf3fa"
-        today = pd.Timestamp.now()
-        if date < today:
-            return "#e65c5c"
-        elif (date - today).days <= 7:
-            return "#f3c852"
-    except:
-        return "#eaf3fa"
-    return "#eaf3fa"
+@st.cache_resource(show_spinner=False)
+def init_db():
+    # Creating tables and checking for missing columns reflects the whole schema; once per process is enough
+    create_db()
+
+init_db()
+
+JOB_POLL_SECONDS = 2
+METRICS_DAYS = 7
+METRICS_TTL_SECONDS = 60
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_policy_index(docs):
+    # docs: tuple of (filename, sha256); rebuilt only when the set of documents changes
+    doc_indexes = load_doc_indexes(sha for _, sha in docs)
+    return PolicyIndex((name, sha, doc_indexes[sha]) for name, sha in docs if sha in doc_indexes)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_obligations(council, version):
+    # version (store.data_version) only keys the cache so writes from any session invalidate it
+    return obligation_frame(council)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_documents(council, version):
+    return list_documents(council)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_deadlines(council, version, today):
+    return classify_deadlines(load_obligations(council, version), now=today)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_cards(council, version, today, doc_ids, status, bucket, grouped):
+    cards = filter_cards(load_deadlines(council, version, today), list(doc_ids), status, bucket)
+    return group_similar(cards) if grouped else cards
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_audit(council, version):
+    return audit_frame(council)
+
+@st.cache_data(show_spinner=False, ttl=METRICS_TTL_SECONDS)
+def load_metrics(council, days):
+    # Timings arrive continuously, so these are refreshed on a timer rather than by data version
+    metrics = metrics_frame(datetime.utcnow() - timedelta(days=days), council=council)
+    overall = stage_percentiles(metrics.assign(started_at=metrics["started_at"].min()))
+    return metrics, overall, stage_percentiles(metrics, freq="D"), stage_count("chat", council)
+
+def export_buttons(label, kind, version, chunks, file_stem, key=""):
+    # The file is only built when a button is clicked, then reused until the data version changes
+    for col, (fmt, mime) in zip(st.columns(len(FORMATS)), FORMATS.items()):
+        col.download_button(
+            label=f"Download {label} {fmt.upper() if fmt == 'csv' else fmt.title()}",
+            data=lambda fmt=fmt: read_export(kind, COUNCIL_NAME, version, fmt, chunks, key),
+            file_name=f"{file_stem}.{fmt}",
+            mime=mime,
+            on_click="ignore",
+            key=f"export_{kind}_{fmt}"
+        )
 
 if uploaded_files:
-    all_policy_text = ""
-    dashboard_data = []
+    # New files are queued for the background worker (worker.py); the page only polls their status
+    # Matched on name and content, so a revised policy under a known name is processed; each upload is hashed once
+    known = document_keys(COUNCIL_NAME)
     for uploaded_file in uploaded_files:
-        pdf_text = extract_pdf_text(uploaded_file)
-        all_policy_text += "\n\n" + pdf_text
-
-        # Usage Analytics
-        st.session_state['usage']['uploads'] += 1
-
-        # Recent Uploads
-        uploaded = any(entry['filename'] == uploaded_file.name for entry in st.session_state['recent_uploads'])
-        if not uploaded:
-            st.session_state['recent_uploads'].insert(0, {
-                "filename": uploaded_file.name,
-                "uploaded_at": datetime.now().strftime('%Y-%m-%d %H:%M')
-            })
-        st.session_state['recent_uploads'] = st.session_state['recent_uploads'][:10]
-
-        if uploaded_file.name not in st.session_state['obligations']:
-            with st.spinner(f"Processing {uploaded_file.name}..."):
-                ai_response = ai_summarize(pdf_text)
-                summary_part, obligations_part = ai_response.split("Obligations:", 1) if "Obligations:" in ai_response else (ai_response, "")
-                obligations_list = []
-                for line in obligations_part.strip().split("\n"):
-                    if line.strip().startswith("-"):
-                        text = line.strip()[1:].strip()
-                        deadline = ""
-                        for kw in ["by ", "before ", "within ", "every ", "on ", "due ", "deadline:"]:
-                            if kw in text.lower():
-                                deadline = text[text.lower().find(kw):]
-                                break
-                        obligations_list.append({
-                            "text": text,
-                            "done": False,
-                            "assigned_to": "",
-                            "deadline": deadline,
-                            "timestamp": None
-                        })
-                st.session_state['obligations'][uploaded_file.name] = {
-                    "summary": summary_part.strip(),
-                    "obligations": obligations_list
-                }
-                st.session_state['audit_log'].append({
-                    "action": "upload",
-                    "file": uploaded_file.name,
-                    "obligation": "",
-                    "who": "You",
-                    "time": datetime.now().strftime("%Y-%m-%d %H:%M")
-                })
-
-    # Reminders Bar
-    st.markdown("### ⏰ Reminders")
-    reminder_count, upcoming_count = 0, 0
-    for fname, doc in st.session_state['obligations'].items():
-        for obl in doc["obligations"]:
-            color = get_deadline_color(obl.get("deadline", ""))
-            if color == "#e65c5c":
-                st.markdown(f'<span class="reminder">Overdue:</span> <b>{obl["text"]}</b>', unsafe_allow_html=True)
-                reminder_count += 1
-            elif color == "#f3c852":
-                st.markdown(f'<span class="reminder-upcoming">Due Soon:</span> <b>{obl["text"]}</b>', unsafe_allow_html=True)
-                upcoming_count += 1
-    if reminder_count == 0 and upcoming_count == 0:
-        st.info("No overdue or upcoming deadlines!")
-
-    # Full-Text Search
-    st.markdown("---")
+        if uploaded_file.file_id in st.session_state['checked_uploads']:
+            continue
+        data = uploaded_file.getvalue()
+        if (uploaded_file.name, file_sha256(data)) not in known:
+            st.session_state['queued_jobs'][uploaded_file.file_id] = enqueue_file(COUNCIL_NAME, uploaded_file.name, data)
+        st.session_state['checked_uploads'].add(uploaded_file.file_id)
+
+rendered_version = data_version(COUNCIL_NAME)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def ingestion_status():
+    job_ids = list(st.session_state['queued_jobs'].values())
+    if not job_ids:
+        return
+    jobs = list_jobs(COUNCIL_NAME, job_ids=job_ids)
+    active = [job for job in jobs if job.status in ACTIVE_STATUSES]
+    for job in active:
+        st.progress(job.progress or 0.0, text=f"{job.filename}: {job.message or job.status}")
+    for job in jobs:
+        if job.status == "failed":
+            st.error(f"Could not process {job.filename}: {job.error}")
+    if active:
+        st.caption("Files are processed in the background; you can keep using the page.")
+    if data_version(COUNCIL_NAME) != rendered_version:
+        st.rerun()  # a document finished; refresh the whole page to show it
+
+ingestion_status()
+
+# Each interactive section below is a fragment: its widgets rerun only that section,
+# against data loaded once per full run and memoized by data version.
+
+@st.fragment
+def search_section(deadlines, documents, version):
+    doc_shas = {doc["id"]: doc["sha256"] for doc in documents}
+    sha_names = {doc["sha256"]: doc["filename"] for doc in documents}
     st.markdown("### 🔍 Full-Text Search")
     search_text = st.text_input("Search all obligations, summaries, and policies...", key="search")
+    if search_text != st.session_state['search_text']:
+        st.session_state["search_page"] = 1  # new query starts from the first page of results
     st.session_state['search_text'] = search_text
-    dashboard_data = []
-    for fname, doc in st.session_state['obligations'].items():
-        for obl in doc["obligations"]:
-            match = (
-                (search_text.lower() in obl["text"].lower() if search_text else True) or
-                (search_text.lower() in doc["summary"].lower() if search_text else True)
+    matched = None
+    if search_text:
+        result_page = st.session_state.get("search_page", 1)
+        with span("search", council=COUNCIL_NAME):
+            total, hits = search_policies(search_text, list(sha_names), page=result_page)
+            if not hits and result_page > 1:
+                # The document set shrank under the selected page; fall back to the first one
+                st.session_state["search_page"] = result_page = 1
+                total, hits = search_policies(search_text, list(sha_names), page=result_page)
+            matched = matching_obligations(search_text, list(sha_names))
+        st.caption(f"{total} result(s)")
+        for hit in hits:
+            where = {"summary": "Summary", "obligation": "Obligation", "page": f"Page {hit['ref']}"}[hit["kind"]]
+            st.markdown(
+                f"<b>{sha_names[hit['sha256']]}</b> · <span style='color:#1976d2;'>{where}</span><br>{hit['snippet']}",
+                unsafe_allow_html=True
             )
-            if match:
-                dashboard_data.append({
-                    "Filename": fname,
-                    "Summary": doc["summary"][:100]+"..." if len(doc["summary"]) > 100 else doc["summary"],
-                    "Obligation": obl["text"],
-                    "Done": "✅" if obl['done'] else "⬜️",
-                    "Assigned to": obl.get("assigned_to",""),
-                    "Deadline": obl.get("deadline",""),
-                    "Timestamp": obl.get("timestamp","")
-                })
-    if dashboard_data:
-        df = pd.DataFrame(dashboard_data)
+        if total > SEARCH_PAGE_SIZE:
+            st.number_input("Results page", min_value=1, max_value=-(-total // SEARCH_PAGE_SIZE), key="search_page")
+    view = deadlines
+    if matched is not None:
+        view = deadlines[[(doc_shas[doc_id], idx) in matched for doc_id, idx in zip(deadlines["doc_id"], deadlines["idx"])]]
+    if not view.empty:
+        df = obligations_table(view, documents)
         st.dataframe(df, use_container_width=True)
-        st.download_button(
-            label="Download Obligations CSV",
-            data=df.to_csv(index=False),
-            file_name="policy_obligations.csv",
-            mime="text/csv"
-        )
+        export_buttons("Obligations", "obligations", version, lambda: frame_chunks(df), "policy_obligations", key=search_text)
     else:
         st.info("No matching obligations found.")
 
+def obligations_table(view, documents):
+    short_summaries = {doc["id"]: doc["summary"][:100]+"..." if len(doc["summary"]) > 100 else doc["summary"] for doc in documents}
+    return pd.DataFrame({
+        "Filename": view["file"],
+        "Summary": view["doc_id"].map(short_summaries),
+        "Obligation": view["text"],
+        "Responsible": view["responsible"],
+        "Done": view["done"].map({True: "✅", False: "⬜️"}),
+        "Assigned to": view["assigned_to"],
+        "Deadline": view["deadline"],
+        "Due date": view["due"].dt.strftime("%Y-%m-%d").fillna(""),
+        "Timestamp": view["timestamp"]
+    }).reset_index(drop=True)
+
+@st.fragment
+def dashboard_section(documents, version):
+    st.markdown("## 📊 Compliance Dashboard (Card View)")
+    doc_names = {doc["id"]: doc["filename"] for doc in documents}
+    col1, col2, col3 = st.columns([2, 1, 1])
+    doc_filter = col1.multiselect("Documents", [doc["id"] for doc in reversed(documents)], format_func=doc_names.get, key="card_docs")
+    status_filter = col2.selectbox("Status", STATUS_FILTERS, key="card_status")
+    bucket_filter = col3.selectbox("Deadline", list(DEADLINE_BUCKETS), format_func=DEADLINE_BUCKETS.get, key="card_bucket")
+    grouped = st.toggle("Group similar obligations across policies", value=True, key="card_group")
+    cards = load_cards(COUNCIL_NAME, version, date.today(), tuple(doc_filter), status_filter, bucket_filter, grouped)
+    card_pages = max(1, -(-len(cards) // CARDS_PER_PAGE))
+    if st.session_state.get("card_page", 1) > card_pages:
+        st.session_state["card_page"] = card_pages  # filters shrank the result set
+    card_page = st.number_input("Dashboard page", min_value=1, max_value=card_pages, key="card_page") if card_pages > 1 else 1
+    start = (card_page - 1) * CARDS_PER_PAGE
+    if cards.empty:
+        st.info("No obligations match these filters.")
+    else:
+        summaries = {doc["id"]: doc["summary"] for doc in documents}
+        with span("dashboard", council=COUNCIL_NAME):
+            cards_html = render_cards(cards.iloc[start:start + CARDS_PER_PAGE], summaries)
+        st.markdown(cards_html, unsafe_allow_html=True)
+        st.caption(f"Showing {start + 1}–{min(start + CARDS_PER_PAGE, len(cards))} of {len(cards)} {'items' if grouped else 'obligations'}")
+
+@st.fragment
+def chat_section(documents):
+    st.markdown("## 🤖 Ask Your Policies (AI Chat)")
+    st.caption("Type a question about your policies. The AI answers ONLY using your uploaded documents.")
+    query = st.text_input("Ask a policy/compliance question", key="policy_qa")
+    if query:
+        with st.spinner("Getting answer..."), span("chat", council=COUNCIL_NAME):
+            policy_index = get_policy_index(tuple((doc["filename"], doc["sha256"]) for doc in reversed(documents)))
+            answer = ai_chat(query, policy_index.context(query))
+        st.success(answer)
+        flush_metrics()  # fragment reruns don't reach the flush at the end of the script
+
+@st.fragment
+def audit_section(version):
+    st.markdown("## 🕵️ Audit Log")
+    st.caption("All major actions are tracked for compliance and audit reporting.")
+    st.dataframe(load_audit(COUNCIL_NAME, version), use_container_width=True)
+    export_buttons("Audit Log", "audit", version, lambda: audit_chunks(COUNCIL_NAME, EXPORT_CHUNK_ROWS), "audit_log")
+
+@st.fragment
+def latency_trend(daily):
+    # Charts are the slowest element on the page, so this one is drawn only on request
+    if st.toggle("Show p95 latency trend", key="latency_trend"):
+        st.caption("p95 latency per stage by day (ms)")
+        st.line_chart(daily.pivot(index="period", columns="stage", values="p95_ms"))
+
+documents = load_documents(COUNCIL_NAME, rendered_version)
+if documents:
+    # Deadlines are parsed at ingestion; classification is redone only when the store or the date changes
+    deadlines = load_deadlines(COUNCIL_NAME, rendered_version, date.today())
+
+    # Reminders Bar: one line per group of similar obligations
+    st.markdown("### ⏰ Reminders")
+    grouped_deadlines = load_cards(COUNCIL_NAME, rendered_version, date.today(), (), "All", "all", True)
+    reminders = grouped_deadlines[grouped_deadlines["status"] != "none"].sort_values("next_due")
+    if reminders.empty:
+        st.info("No overdue or upcoming deadlines!")
+    else:
+        lines = [
+            (f'<span class="reminder">Overdue:</span> <b>{html.escape(text)}</b>' if status == "overdue"
+             else f'<span class="reminder-upcoming">Due Soon:</span> <b>{html.escape(text)}</b>')
+            + (f' <i>({len(sources)} policies)</i>' if len(sources) > 1 else '')
+            for text, status, sources in zip(
+                reminders["text"].head(REMINDER_LIMIT), reminders["status"].head(REMINDER_LIMIT), reminders["sources"].head(REMINDER_LIMIT)
+            )
+        ]
+        if len(reminders) > REMINDER_LIMIT:
+            lines.append(f"<i>+{len(reminders) - REMINDER_LIMIT} more in the dashboard below</i>")
+        st.markdown("<br>".join(lines), unsafe_allow_html=True)
+
+    # Full-Text Search
+    st.markdown("---")
+    search_section(deadlines, documents, rendered_version)
+
     # Recent Uploads Section
     st.markdown("---")
     st.markdown("""
@@ -411,10 +492,10 @@ if uploaded_files:
     <div class="recent-uploads-card">
         <div class="recent-uploads-title">📂 Recent Uploads</div>
     """, unsafe_allow_html=True)
-    recent_uploads = st.session_state['recent_uploads'][:10]
+    recent_uploads = documents[:10]
     if recent_uploads:
         for item in recent_uploads:
-            fname, uploaded_at = item['filename'], item['uploaded_at']
+            fname, uploaded_at = item['filename'], item['upload_time'].strftime('%Y-%m-%d %H:%M')
             st.markdown(
                 f"<span class='recent-upload-filename'>• {fname}</span> &nbsp; "
                 f"<span style='color:#388e3c;font-size:0.96em;'>uploaded {uploaded_at}</span>",
@@ -426,73 +507,53 @@ if uploaded_files:
 
     # Visual Obligation Cards (Compliance Dashboard)
     st.markdown("---")
-    st.markdown("""
-    <style>
-    .ob-card {background:#fff;border-radius:18px;box-shadow:0 2px 14px #1966b222;margin-bottom:20px;padding:22px 22px 16px 22px;}
-    .ob-title {font-size:1.09em; font-weight:600; color:#1966b2;}
-    .ob-done {color:#59c12a; font-weight:700;}
-    .ob-chip {display:inline-block; background:#e3f2fd; color:#1764a7; border-radius:9px; padding:2px 11px 3px 11px; margin-right:7px; font-size:0.97em;}
-    .ob-overdue {background:#e65c5c; color:#fff;}
-    .ob-upcoming {background:#f3c852; color:#444;}
-    </style>
-    """, unsafe_allow_html=True)
-
-    st.markdown("## 📊 Compliance Dashboard (Card View)")
-    for fname, doc in st.session_state['obligations'].items():
-        st.markdown(f"<div class='ob-title'>📑 {fname}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div style='margin-bottom:8px;color:#1565c0;font-size:1.06em;'><b>Summary:</b> {doc['summary']}</div>", unsafe_allow_html=True)
-        for idx, obl in enumerate(doc["obligations"]):
-            color = get_deadline_color(obl.get("deadline", ""))
-            chip_class = "ob-chip"
-            if color == "#e65c5c":
-                chip_class += " ob-overdue"
-            elif color == "#f3c852":
-                chip_class += " ob-upcoming"
-            status_icon = "✅" if obl['done'] else "⬜️"
-            st.markdown(
-                f"""
-                <div class="ob-card">
-                    <span style="font-size:1.23em;">{status_icon}</span>
-                    <b style="margin-left:7px;">{obl['text']}</b><br>
-                    <span class="{chip_class}">{'Overdue' if color=='#e65c5c' else ('Due soon' if color=='#f3c852' else 'Deadline')}</span>
-                    <span class="ob-chip">{obl.get('deadline', '')}</span>
-                    <span class="ob-chip" style="background:#e3ffd6;color:#388e3c;">Assigned: {obl.get('assigned_to','')}</span>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    st.markdown(CARD_CSS, unsafe_allow_html=True)
+    dashboard_section(documents, rendered_version)
 
     # POLICY Q&A CHAT
     st.markdown("---")
-    st.markdown("## 🤖 Ask Your Policies (AI Chat)")
-    st.caption("Type a question about your policies. The AI answers ONLY using your uploaded documents.")
-    query = st.text_input("Ask a policy/compliance question", key="policy_qa")
-    if query:
-        st.session_state['usage']['qa'] += 1
-        with st.spinner("Getting answer..."):
-            answer = ai_chat(query, all_policy_text)
-        st.success(answer)
+    chat_section(documents)
 
     # AUDIT LOG
     st.markdown("---")
-    st.markdown("## 🕵️ Audit Log")
-    st.caption("All major actions are tracked for compliance and audit reporting.")
-    audit_df = pd.DataFrame(st.session_state['audit_log'])
-    st.dataframe(audit_df, use_container_width=True)
-    st.download_button(
-        label="Download Audit Log CSV",
-        data=audit_df.to_csv(index=False),
-        file_name="audit_log.csv",
-        mime="text/csv"
-    )
+    audit_section(rendered_version)
 
     # USAGE ANALYTICS
     st.markdown("---")
     st.markdown("## 📈 Usage Analytics")
-    usage = st.session_state['usage']
-    st.metric("Policy PDFs Uploaded", usage["uploads"])
-    st.metric("AI Policy Q&As", usage["qa"])
-    st.caption("Counts reset on server restart. For advanced usage, connect to a database.")
+    st.metric("Policy PDFs Uploaded", len(documents))
+    metrics, overall, daily, qa_count = load_metrics(COUNCIL_NAME, METRICS_DAYS)
+    st.metric("AI Policy Q&As", qa_count)
+    extract_stats = cache_stats("extract")
+    st.metric("PDF Extraction Cache Hits", extract_stats["hits"], help=f"{extract_stats['misses']} misses")
+    with st.expander("🛠️ Cache Admin"):
+        llm_stats = cache_stats("llm")
+        llm_lookups = llm_stats["hits"] + llm_stats["misses"]
+        col1, col2 = st.columns(2)
+        col1.metric("AI Response Cache Hit Rate", f"{(llm_stats['hits'] / llm_lookups if llm_lookups else 0):.0%}", help=f"{llm_stats['hits']} hits / {llm_lookups} lookups")
+        col2.metric("Tokens Saved", f"{llm_stats['tokens_saved']:,}")
+
+    st.markdown(f"### ⏱️ Performance (last {METRICS_DAYS} days)")
+    if metrics.empty:
+        st.info("No timings recorded yet.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Prompt Tokens", f"{int(metrics['prompt_tokens'].sum()):,}")
+        col2.metric("Completion Tokens", f"{int(metrics['completion_tokens'].sum()):,}")
+        col3.metric("Estimated AI Cost", f"${metrics['cost_usd'].sum():,.2f}")
+        st.dataframe(
+            overall.drop(columns="period").rename(columns={"stage": "Stage", "count": "Calls", "p50_ms": "p50 (ms)", "p95_ms": "p95 (ms)"}).round(1),
+            use_container_width=True, hide_index=True
+        )
+        latency_trend(daily)
+        st.download_button(
+            label="Download Metrics CSV",
+            data=lambda: metrics.to_csv(index=False),
+            file_name="policy_metrics.csv",
+            mime="text/csv",
+            on_click="ignore"
+        )
+    st.caption("Documents, obligations, the audit log and timings are stored in the database; `python metrics.py` exports timings for monitoring.")
 
 else:
     st.info("Upload one or more council policy PDFs to begin.")
@@ -501,3 +562,5 @@ st.markdown("---")
 st.markdown("""
 <span style='color: #59c12a; font-weight:bold;'>PolicySimplify AI – Built for Australian councils. All data hosted securely in Australia.</span>
 """, unsafe_allow_html=True)
+
+flush_metrics()
@@ -0,0 +1,286 @@
+"""Offline batch summarization for large, non-urgent backfills.
+
+    python batch.py /path/to/archive --council "Wyndham City Council"
+    python batch.py /path/to/archive --council "..." --endpoint local   # file-based stand-in
+
+Summarization requests for every chunk of every PDF are written as one JSONL
+file in the OpenAI Batch API format, submitted, and polled until complete.
+Results are stored as shared chunk results. Documents with several chunks then
+get a second, smaller batch to combine their section summaries. Finally the
+documents go through the normal pipeline, which now finds every model
+response already stored, and are saved in bulk. Requests that fail in the
+batch fall back to live calls at that last step.
+
+Interactive uploads are unaffected and keep using the worker.
+
+The run state (batch ids per round) is kept in a manifest next to the
+archive. Rerunning the same command after an interruption resumes polling the
+batches already submitted instead of paying for them again.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from bulk_ingest import find_pdfs, _extract_file
+from cache import file_sha256, get_extracted, put_extracted, llm_cache_key, get_llm_response, put_llm_response
+from db import create_db
+from dedupe import get_shared_result, get_chunk_result, find_chunk_result, save_chunk_result
+from textstore import DocumentText
+from extraction import parse_extraction, extraction_result
+from ingest import chunk_pages, chunk_key, process_pages, PAGE_BREAK
+from llm import get_client, MODEL, SUMMARIZE_PARAMS, COMBINE_PARAMS, summarize_prompt, combine_prompt
+from metrics import record, flush_metrics, council_scope
+from store import document_names, save_documents
+
+BATCH_DIR = os.getenv("BATCH_DIR", "batches")
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 50000))  # Batch API limit per input file
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", 60))
+# Batch requests are billed at half the interactive price
+BATCH_PRICE_FACTOR = 0.5
+MANIFEST_NAME = ".policysimplify_batch.json"
+DONE_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+class OpenAIBatchEndpoint:
+    def __init__(self, client=None):
+        self.client = client or get_client()
+
+    def submit(self, path):
+        with open(path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        return self.client.batches.create(
+            input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+        ).id
+
+    def status(self, batch_id):
+        """(status, output_file_id, error_file_id)"""
+        batch = self.client.batches.retrieve(batch_id)
+        return batch.status, batch.output_file_id, batch.error_file_id
+
+    def download(self, file_id):
+        return self.client.files.content(file_id).text
+
+class LocalBatchEndpoint:
+    """File-based stand-in for the Batch API, for tests and development.
+
+    Each batch is a directory under BATCH_DIR. The first status check answers
+    every request with respond(body) and writes output.jsonl / errors.jsonl
+    in the Batch API's output format. respond defaults to a live chat
+    completion through get_client(), which can point at stub_openai.py.
+    """
+
+    def __init__(self, directory=BATCH_DIR, respond=None):
+        self.directory = directory
+        self.respond = respond or (lambda body: get_client().chat.completions.create(**body).model_dump())
+
+    def submit(self, path):
+        batch_id = f"batch_local_{uuid.uuid4().hex}"
+        os.makedirs(os.path.join(self.directory, batch_id))
+        shutil.copy(path, os.path.join(self.directory, batch_id, "input.jsonl"))
+        return batch_id
+
+    def _process(self, batch_dir):
+        with open(os.path.join(batch_dir, "input.jsonl")) as f, \
+                open(os.path.join(batch_dir, "output.jsonl"), "w") as out, \
+                open(os.path.join(batch_dir, "errors.jsonl"), "w") as errors:
+            for line in f:
+                request = json.loads(line)
+                try:
+                    body = self.respond(request["body"])
+                except Exception as e:
+                    errors.write(json.dumps({"custom_id": request["custom_id"], "response": None,
+                                             "error": {"code": type(e).__name__, "message": str(e)}}) + "\n")
+                else:
+                    out.write(json.dumps({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"],
+                                          "response": {"status_code": 200, "body": body}, "error": None}) + "\n")
+
+    def status(self, batch_id):
+        batch_dir = os.path.join(self.directory, batch_id)
+        if not os.path.exists(os.path.join(batch_dir, "output.jsonl")):
+            self._process(batch_dir)
+        return "completed", os.path.join(batch_id, "output.jsonl"), os.path.join(batch_id, "errors.jsonl")
+
+    def download(self, file_id):
+        with open(os.path.join(self.directory, file_id)) as f:
+            return f.read()
+
+def batch_request(custom_id, prompt, params):
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {"model": MODEL, "messages": [{"role": "user", "content": prompt}], **params}
+    }
+
+def write_requests(requests, directory):
+    """Split requests into Batch API input files; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for start in range(0, len(requests), BATCH_MAX_REQUESTS):
+        path = os.path.join(directory, f"requests-{uuid.uuid4().hex}.jsonl")
+        with open(path, "w") as f:
+            for request in requests[start:start + BATCH_MAX_REQUESTS]:
+                f.write(json.dumps(request) + "\n")
+        paths.append(path)
+    return paths
+
+def store_results(text):
+    """Store a batch output file; returns (stored, failed) request counts."""
+    stored = failed = 0
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            failed += 1
+            continue
+        body = response["body"]
+        content = body["choices"][0]["message"]["content"].strip()
+        usage = body.get("usage") or {}
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        kind, key = item["custom_id"].split(":", 1)
+        extraction, complete = parse_extraction(content) if kind == "chunk" else (None, False)
+        if complete:
+            save_chunk_result(key, extraction_result(extraction.summary, extraction.obligations))
+        else:
+            # Combine replies, and chunk replies cut off by max_tokens: the live pass reads these from
+            # the response cache (chunk_key is the same key) and only requests the continuation
+            put_llm_response(key, MODEL, content, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        # Untimed: a batch reply has no latency of its own, only tokens and cost
+        record("llm_batch", None, model=MODEL, prompt_tokens=prompt_tokens,
+               completion_tokens=completion_tokens, price_factor=BATCH_PRICE_FACTOR)
+        stored += 1
+    flush_metrics()
+    return stored, failed
+
+def _chunks(sha256):
+    with DocumentText(sha256) as pages:
+        return chunk_pages(pages)
+
+def chunk_requests(docs):
+    requests = {}
+    for _, sha256 in docs:
+        if get_shared_result(sha256) is not None:
+            continue
+        for chunk in _chunks(sha256):
+            key = chunk_key(chunk)
+            if key not in requests and find_chunk_result(key, chunk) is None:
+                requests[key] = batch_request(f"chunk:{key}", summarize_prompt(chunk), SUMMARIZE_PARAMS)
+    return list(requests.values())
+
+def combine_requests(docs):
+    requests = {}
+    for _, sha256 in docs:
+        if get_shared_result(sha256) is not None:
+            continue
+        parts = [get_chunk_result(chunk_key(chunk)) for chunk in _chunks(sha256)]
+        summaries = [part["summary"] for part in parts if part is not None and part["summary"]]
+        if None in parts or len(summaries) < 2:
+            continue  # single-section documents need no combine step; failed chunks run live later
+        prompt = combine_prompt(summaries)
+        key = llm_cache_key(MODEL, prompt, **COMBINE_PARAMS)
+        if key not in requests and get_llm_response(key) is None:
+            requests[key] = batch_request(f"combine:{key}", prompt, COMBINE_PARAMS)
+    return list(requests.values())
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def _save_manifest(path, manifest):
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def run_round(name, build_requests, endpoint, manifest, manifest_path, poll_seconds):
+    """Submit (or resume) one round of batches, wait for them, and store their results."""
+    state = manifest.get(name)
+    if state is None:
+        requests = build_requests()
+        print(f"{name}: {len(requests)} request(s)")
+        state = manifest[name] = {"batches": [endpoint.submit(path) for path in write_requests(requests, BATCH_DIR)], "stored": []}
+        _save_manifest(manifest_path, manifest)
+    pending = [batch_id for batch_id in state["batches"] if batch_id not in state["stored"]]
+    while pending:
+        for batch_id in list(pending):
+            status, output_file_id, error_file_id = endpoint.status(batch_id)
+            if status not in DONE_STATUSES:
+                continue
+            stored, failed = store_results(endpoint.download(output_file_id)) if output_file_id else (0, 0)
+            if error_file_id:
+                failed += sum(1 for line in endpoint.download(error_file_id).splitlines() if line.strip())
+            print(f"{name}: batch {batch_id} {status}: {stored} stored, {failed} failed", flush=True)
+            state["stored"].append(batch_id)
+            _save_manifest(manifest_path, manifest)
+            pending.remove(batch_id)
+        if pending:
+            time.sleep(poll_seconds)
+
+def batch_summarize(root, council, endpoint=None, processes=None, batch_size=25, poll_seconds=BATCH_POLL_SECONDS, who="batch"):
+    create_db()
+    endpoint = endpoint or OpenAIBatchEndpoint()
+    manifest_path = os.path.join(root, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    skip = document_names(council)
+    paths = [p for p in find_pdfs(root) if os.path.relpath(p, root) not in skip]
+    print(f"{len(paths)} PDF(s) to summarize from {root}")
+
+    with council_scope(council):
+        # Put every file in the text store first; each round rereads pages from there
+        docs, to_extract = [], []
+        for path in paths:
+            with open(path, "rb") as f:
+                sha256 = file_sha256(f.read())
+            docs.append((os.path.relpath(path, root), sha256))
+            if get_extracted(sha256) is None:
+                to_extract.append(path)
+        # A file that can't be read is left out; one broken PDF mustn't stop the archive being batched
+        failed = set()
+        with ProcessPoolExecutor(max_workers=processes) as procs:
+            futures = {procs.submit(_extract_file, path): os.path.relpath(path, root) for path in to_extract}
+            for future in as_completed(futures):
+                try:
+                    sha256, text, extract_ms = future.result()
+                except Exception as e:
+                    failed.add(futures[future])
+                    print(f"Failed {futures[future]}: {e}", flush=True)
+                    continue
+                record("extract", extract_ms)
+                put_extracted(sha256, text.split(PAGE_BREAK))
+        docs = [(filename, sha256) for filename, sha256 in docs if filename not in failed]
+
+        run_round("chunks", lambda: chunk_requests(docs), endpoint, manifest, manifest_path, poll_seconds)
+        run_round("combine", lambda: combine_requests(docs), endpoint, manifest, manifest_path, poll_seconds)
+
+        batch = []
+        for filename, sha256 in docs:
+            try:
+                with DocumentText(sha256) as pages:
+                    batch.append((filename, sha256, process_pages(sha256, pages)))
+            except Exception as e:
+                print(f"Failed {filename}: {e}", flush=True)
+            if len(batch) >= batch_size:
+                save_documents(council, batch, who=who)
+                batch.clear()
+        if batch:
+            save_documents(council, batch, who=who)
+        flush_metrics()
+    os.remove(manifest_path)
+    print(f"Finished: {len(docs)} document(s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a directory of policy PDFs through the batch endpoint")
+    parser.add_argument("root", help="directory searched recursively for PDFs")
+    parser.add_argument("--council", required=True)
+    parser.add_argument("--endpoint", choices=["openai", "local"], default="openai",
+                        help="local answers batches from files under BATCH_DIR, using the configured chat endpoint")
+    parser.add_argument("--processes", type=int, default=None, help="extraction processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=25, help="documents per database commit")
+    parser.add_argument("--poll-seconds", type=float, default=BATCH_POLL_SECONDS)
+    args = parser.parse_args()
+    endpoint = LocalBatchEndpoint() if args.endpoint == "local" else OpenAIBatchEndpoint()
+    batch_summarize(args.root, args.council, endpoint, args.processes, args.batch_size, args.poll_seconds)
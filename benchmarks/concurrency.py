@@ -0,0 +1,51 @@
+"""Regression check for database locking under concurrent ingestion.
+
+    python -m benchmarks.concurrency               # 5 rounds of 6 new PDFs, 4 at a time
+    python -m benchmarks.concurrency --rounds 20
+
+Each round ingests fresh synthetic PDFs with ingest_files against a throwaway
+SQLite database and the stub endpoint (stub_openai.py), with a short model
+latency so the threads' cache, index and result writes interleave. Exits
+non-zero if any file failed, e.g. with "database is locked".
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent ingestion locking check")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--docs", type=int, default=6, help="new PDFs per round")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub model latency in seconds")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="policysimplify-concurrency-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'check.db')}"
+    os.environ["TEXT_STORE_DIR"] = os.path.join(workdir, "text")
+    os.environ["LLM_TOKENS_PER_MINUTE"] = "0"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from stub_openai import start_stub, stub_base_url
+    server = start_stub(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = stub_base_url(server)
+    from db import create_db
+    from ingest import ingest_files
+    from benchmarks.synthetic import make_policy_pdf
+
+    create_db()
+    failures = []
+    for round_number in range(args.rounds):
+        docs = [(f"round{round_number}-{i}.pdf", make_policy_pdf(10, seed=round_number * 1000 + i)) for i in range(args.docs)]
+        errors = [(name, error) for name, _, error in ingest_files(docs, max_workers=args.concurrency) if error]
+        print(f"round {round_number + 1}: {len(docs) - len(errors)} ok, {len(errors)} failed", flush=True)
+        failures += errors
+    server.shutdown()
+    for name, error in failures:
+        print(f"{name}: {error!r}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Reproducible benchmarks for the ingestion and page-rendering hot paths.
+
+    python -m benchmarks.run                   # full run, results saved under benchmarks/results/
+    python -m benchmarks.run --quick           # smaller sizes
+    python -m benchmarks.run --compare <file>  # compare against an earlier result file
+
+Everything runs against a throwaway SQLite database and the local stub
+chat-completions endpoint (stub_openai.py), so no network access or tokens are
+needed. Each stage reports wall time and peak traced memory. By default results
+are compared with the most recent earlier result file.
+
+The cold_* stages render app.py in a fresh interpreter (streamlit already
+imported, as in a running server) and report the script run alone: the login
+screen, the page when nothing has been preloaded, and the first page after the
+login screen has been shown.
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Run in a subprocess: prints the seconds taken by one script run of the app
+# (for after_login, the first page run following a login screen)
+COLD_RUN = """
+import sys, threading, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.session_state["authenticated"] = sys.argv[2] == "page"
+if sys.argv[2] == "after_login":
+    # The user is on the login screen long enough for the background preload to finish
+    at.run()
+    for thread in threading.enumerate():
+        if thread.name == "preload-app-modules":
+            thread.join()
+    at.session_state["authenticated"] = True
+start = time.perf_counter()
+at.run()
+seconds = time.perf_counter() - start
+if at.exception:
+    sys.exit(at.exception[0].message)
+print(seconds)
+"""
+
+FULL = {"pages": [1, 10, 50], "obligations": [10, 100, 1000], "rows": [100, 1000, 10000], "ingest_docs": 8}
+QUICK = {"pages": [1, 5], "obligations": [10, 100], "rows": [100, 1000], "ingest_docs": 3}
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+
+    def measure(self, stage, params, fn):
+        tracemalloc.start()
+        start = time.perf_counter()
+        value = fn()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.add(stage, params, seconds, peak)
+        return value
+
+    def add(self, stage, params, seconds, peak=0):
+        self.results.append({"stage": stage, "params": params, "seconds": round(seconds, 6), "peak_mb": round(peak / 2**20, 3)})
+        print(f"{stage:<22} {json.dumps(params):<40} {seconds * 1000:>10.1f} ms {peak / 2**20:>9.2f} MB", flush=True)
+
+def cold_render(mode):
+    """Seconds for one run of app.py in a new interpreter; mode is "login", "page" or "after_login"."""
+    output = subprocess.run([sys.executable, "-c", COLD_RUN, APP_PATH, mode], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+def run(sizes, latency, concurrency):
+    # Point every module at a scratch database and the stub before they are imported
+    workdir = tempfile.mkdtemp(prefix="policysimplify-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["EXPORT_DIR"] = os.path.join(workdir, "exports")
+    os.environ["TEXT_STORE_DIR"] = os.path.join(workdir, "textstore")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ["LLM_TOKENS_PER_MINUTE"] = "0"
+    from stub_openai import start_stub, stub_base_url
+    server = start_stub(latency=latency)
+    os.environ["OPENAI_BASE_URL"] = stub_base_url(server)
+
+    import pandas as pd
+    from db import create_db
+    from ingest import extract_pdf_text, parse_obligations, ingest_files
+    from llm import get_client
+    from deadlines import classify_deadlines
+    from search import index_search_document, search_policies, matching_obligations
+    from store import save_documents, obligation_frame, list_documents
+    from dashboard import filter_cards, render_cards, render_card, render_doc_header, CARDS_PER_PAGE
+    from benchmarks.synthetic import make_policy_pdf, make_reply
+
+    create_db()
+    get_client()  # the SDK is imported on first use; keep that out of the measured stages
+    rec = Recorder()
+
+    for mode in ("login", "page", "after_login"):
+        rec.add(f"cold_{mode}", {}, cold_render(mode))
+
+    for pages in sizes["pages"]:
+        pdf = make_policy_pdf(pages, seed=pages)
+        rec.measure("extract_pdf_text", {"pages": pages}, lambda: extract_pdf_text(io.BytesIO(pdf)))
+
+    for n in sizes["obligations"]:
+        reply = make_reply(n, seed=n)
+        rec.measure("parse_obligations", {"obligations": n}, lambda: parse_obligations(reply))
+
+    for rows in sizes["rows"]:
+        parsed = parse_obligations(make_reply(rows, seed=rows))["obligations"]
+        frame = pd.DataFrame({
+            "due": pd.to_datetime([o["due_date"] for o in parsed], errors="coerce"),
+            "recurrence_days": pd.to_numeric([o["recurrence_days"] for o in parsed], errors="coerce")
+        })
+        rec.measure("classify_deadlines", {"obligations": rows}, lambda: classify_deadlines(frame))
+
+    docs = [(f"bench-{i}.pdf", make_policy_pdf(10, seed=1000 + i)) for i in range(sizes["ingest_docs"])]
+    errors = rec.measure(
+        "ingest_batch", {"docs": len(docs), "pages": 10, "latency_s": latency, "concurrency": concurrency},
+        lambda: [(name, error) for name, _, error in ingest_files(docs, max_workers=concurrency) if error]
+    )
+    if errors:
+        # A failed file finishes early, so the timing would look better than it is
+        name, error = errors[0]
+        raise RuntimeError(f"ingest_batch: {len(errors)} of {len(docs)} file(s) failed, first {name}: {error!r}")
+
+    # Page rerun data path at increasing store sizes: one council per size
+    for rows in sizes["rows"]:
+        council = f"bench-{rows}"
+        per_doc = 20
+        items = []
+        for d in range(max(1, rows // per_doc)):
+            result = parse_obligations(make_reply(per_doc, seed=d))
+            sha256 = f"{rows:06d}{d:058d}"
+            items.append((f"doc-{d}.pdf", sha256, result))
+            index_search_document(sha256, result, [f"Page text for document {d} about privacy and records."])
+        save_documents(council, items)
+        documents = list_documents(council)
+        shas = [doc["sha256"] for doc in documents]
+        summaries = {doc["id"]: doc["summary"] for doc in documents}
+
+        frame = rec.measure("load_obligations", {"obligations": rows}, lambda: obligation_frame(council))
+        classified = rec.measure("rerun_classify", {"obligations": rows}, lambda: classify_deadlines(frame))
+        rec.measure("search", {"obligations": rows}, lambda: (search_policies("privacy", shas), matching_obligations("privacy", shas)))
+
+        def dashboard():
+            render_card.cache_clear()
+            render_doc_header.cache_clear()
+            cards = filter_cards(classified, status="Open")
+            return render_cards(cards.iloc[:CARDS_PER_PAGE], summaries)
+        rec.measure("dashboard_page", {"obligations": rows}, dashboard)
+        rec.measure("obligations_table", {"obligations": rows}, lambda: pd.DataFrame({
+            "Filename": classified["file"], "Obligation": classified["text"], "Deadline": classified["deadline"]
+        }).to_csv(index=False))
+
+    server.shutdown()
+    return rec.results
+
+def save(results, sizes_name, latency, concurrency):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = _git_commit()
+    payload = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sizes": sizes_name,
+        "latency_s": latency,
+        "concurrency": concurrency,
+        "results": results
+    }
+    path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+def compare(current_path, baseline_path):
+    with open(current_path) as f:
+        current = json.load(f)
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda r: (r["stage"], json.dumps(r["params"], sort_keys=True))
+    before = {key(r): r for r in baseline["results"]}
+    print(f"\nCompared with {os.path.basename(baseline_path)} (commit {baseline['commit']}):")
+    for r in current["results"]:
+        old = before.get(key(r))
+        if old is None or not old["seconds"]:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        flag = "  <-- slower" if ratio > 1.25 else ""
+        print(f"{r['stage']:<22} {key(r)[1]:<40} {old['seconds'] * 1000:>9.1f} -> {r['seconds'] * 1000:>9.1f} ms  x{ratio:.2f}{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="PolicySimplify AI benchmarks")
+    parser.add_argument("--quick", action="store_true", help="smaller input sizes")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=4, help="ingestion concurrency")
+    parser.add_argument("--compare", help="result file to compare against (default: most recent earlier run)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    previous = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    results = run(QUICK if args.quick else FULL, args.latency, args.concurrency)
+    if args.no_save:
+        return
+    path = save(results, "quick" if args.quick else "full", args.latency, args.concurrency)
+    print(f"\nSaved {path}")
+    baseline = args.compare or (previous[-1] if previous else None)
+    if baseline:
+        compare(path, baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Synthetic policy documents and model replies for the benchmarks."""
+import json
+import random
+from fpdf import FPDF
+
+DUTIES = [
+    "report privacy breaches to the Privacy Officer",
+    "review the records management procedure",
+    "complete annual fraud awareness training",
+    "publish the procurement register on the council website",
+    "inspect playground equipment and log defects",
+    "submit the asset management plan to the CEO",
+    "update the risk register with new operational risks",
+    "notify affected residents of planned road closures"
+]
+DEADLINES = [
+    "within 30 days", "every year", "by 30 June 2026", "within 5 business days",
+    "quarterly", "before 1 March 2027", "every 6 months", "due 15/11/2026", ""
+]
+OWNERS = ["Governance team", "Privacy Officer", "People & Culture", "Finance", "Parks team", "CEO"]
+FILLER = (
+    "This section describes the background, scope and definitions that apply to council officers, "
+    "contractors and volunteers when carrying out the activities covered by this policy. "
+)
+
+def obligation_sentence(rng):
+    deadline = rng.choice(DEADLINES)
+    return f"The {rng.choice(OWNERS)} must {rng.choice(DUTIES)} {deadline}".strip() + "."
+
+def make_policy_pdf(pages, seed=0):
+    """PDF bytes with the given number of pages of filler text and obligation sentences."""
+    rng = random.Random(seed)
+    pdf = FPDF()
+    pdf.set_font("helvetica", size=10)
+    for page in range(pages):
+        pdf.add_page()
+        paragraphs = [f"Section {page + 1}. " + FILLER * 3]
+        paragraphs += [obligation_sentence(rng) for _ in range(4)]
+        paragraphs.append(FILLER * 2)
+        pdf.multi_cell(0, 5, "\n\n".join(paragraphs))
+    return bytes(pdf.output())
+
+def make_reply(obligations, seed=0):
+    """A model reply in the JSON format ai_summarize asks for."""
+    rng = random.Random(seed)
+    items = []
+    for _ in range(obligations):
+        deadline = rng.choice(DEADLINES)
+        items.append({
+            "text": f"{rng.choice(DUTIES).capitalize()}",
+            "deadline": "" if deadline.startswith(("every", "quarterly")) else deadline,
+            "responsible": rng.choice(OWNERS),
+            "recurrence": deadline if deadline.startswith(("every", "quarterly")) else ""
+        })
+    return json.dumps({"summary": "This policy sets out council responsibilities.", "obligations": items})
@@ -0,0 +1,137 @@
+"""Headless bulk ingestion for backfilling a council's policy archive.
+
+    python bulk_ingest.py /path/to/archive --council "Wyndham City Council"
+
+PDFs are extracted in a process pool and summarized on a bounded thread pool
+(sharing the token budget and retries in llm.py). Results are written to the
+database in batches. Each committed batch is appended to a checkpoint file, so
+an interrupted run picks up where it stopped.
+"""
+import argparse
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from cache import file_sha256, get_extracted, put_extracted
+from db import create_db
+from ingest import extract_pdf_text, process_pages, PAGE_BREAK, INGEST_CONCURRENCY
+from llm import token_usage
+from metrics import record, flush_metrics, council_scope, in_scope
+from store import document_names, save_documents
+
+CHECKPOINT_NAME = ".policysimplify_checkpoint.jsonl"
+
+def find_pdfs(root):
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        paths += [os.path.join(dirpath, name) for name in sorted(filenames) if name.lower().endswith(".pdf")]
+    return paths
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {json.loads(line)["file"] for line in f if line.strip()}
+
+def append_checkpoint(path, filenames):
+    with open(path, "a") as f:
+        for filename in filenames:
+            f.write(json.dumps({"file": filename, "at": time.strftime("%Y-%m-%dT%H:%M:%S")}) + "\n")
+
+def _extract_file(path):
+    # Runs in a worker process: pure CPU, no database access
+    with open(path, "rb") as f:
+        data = f.read()
+    start = time.perf_counter()
+    text = extract_pdf_text(io.BytesIO(data))
+    return file_sha256(data), text, (time.perf_counter() - start) * 1000
+
+def _process_stored(sha256, pages):
+    with pages:
+        return process_pages(sha256, pages)
+
+class Throughput:
+    def __init__(self):
+        self.start = time.monotonic()
+        self.tokens_at_start = token_usage()
+        self.done = 0
+        self.failed = 0
+
+    def report(self):
+        minutes = max(time.monotonic() - self.start, 1e-9) / 60
+        usage = token_usage()
+        tokens = sum(usage[k] - self.tokens_at_start[k] for k in ("prompt_tokens", "completion_tokens"))
+        cached = usage["cached_calls"] - self.tokens_at_start["cached_calls"]
+        return (
+            f"{self.done} done, {self.failed} failed in {minutes:.1f} min | "
+            f"{self.done / minutes:.1f} docs/min | {tokens / minutes:,.0f} tokens/min | {cached} cached model calls"
+        )
+
+def bulk_ingest(root, council, processes=None, concurrency=INGEST_CONCURRENCY, batch_size=25, checkpoint=None, who="bulk-ingest"):
+    create_db()
+    checkpoint = checkpoint or os.path.join(root, CHECKPOINT_NAME)
+    skip = load_checkpoint(checkpoint) | document_names(council)
+    todo = deque(p for p in find_pdfs(root) if os.path.relpath(p, root) not in skip)
+    print(f"{len(todo)} PDF(s) to ingest from {root}")
+    stats = Throughput()
+    batch = []
+
+    def flush():
+        if batch:
+            save_documents(council, batch, who=who)
+            append_checkpoint(checkpoint, [filename for filename, _, _ in batch])
+            flush_metrics()
+            batch.clear()
+            print(stats.report(), flush=True)
+
+    # Keep only a bounded number of documents in flight so memory doesn't grow with the archive
+    window = (processes or os.cpu_count() or 1) + 2 * concurrency
+    with council_scope(council), ProcessPoolExecutor(max_workers=processes) as procs, ThreadPoolExecutor(max_workers=concurrency) as threads:
+        in_flight = {}
+        while todo or in_flight:
+            while todo and len(in_flight) < window:
+                path = todo.popleft()
+                filename = os.path.relpath(path, root)
+                with open(path, "rb") as f:
+                    sha256 = file_sha256(f.read())
+                pages = get_extracted(sha256)
+                if pages is None:
+                    in_flight[procs.submit(_extract_file, path)] = ("extract", filename)
+                else:
+                    in_flight[threads.submit(in_scope(_process_stored), sha256, pages)] = ("summarize", filename)
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, filename = in_flight.pop(future)
+                try:
+                    if stage == "extract":
+                        sha256, text, extract_ms = future.result()
+                        record("extract", extract_ms)
+                        pages = text.split(PAGE_BREAK)
+                        put_extracted(sha256, pages)
+                        in_flight[threads.submit(in_scope(process_pages), sha256, pages)] = ("summarize", filename)
+                    else:
+                        result = future.result()
+                        batch.append((filename, result["sha256"], result))
+                        stats.done += 1
+                except Exception as e:
+                    stats.failed += 1
+                    print(f"Failed {filename}: {e}", flush=True)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    print("Finished: " + stats.report())
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of policy PDFs")
+    parser.add_argument("root", help="directory searched recursively for PDFs")
+    parser.add_argument("--council", required=True)
+    parser.add_argument("--processes", type=int, default=None, help="extraction processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY, help="documents summarized at once")
+    parser.add_argument("--batch-size", type=int, default=25, help="documents per database commit")
+    parser.add_argument("--checkpoint", help=f"checkpoint file (default: <root>/{CHECKPOINT_NAME})")
+    args = parser.parse_args()
+    bulk_ingest(args.root, args.council, args.processes, args.concurrency, args.batch_size, args.checkpoint)
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from db import SessionLocal, WriteSession, CacheStat, LLMCache
+from textstore import has_text, write_pages, DocumentText
+
+# Model responses older than the TTL are treated as misses; the table is capped by entry count
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", 24 * 30))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+
+def file_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _count(session, name, hit, tokens_saved=0):
+    # Counters are bumped in SQL so concurrent ingestion threads don't lose updates
+    if hit:
+        values = {"hits": CacheStat.hits + 1, "tokens_saved": func.coalesce(CacheStat.tokens_saved, 0) + tokens_saved}
+    else:
+        values = {"misses": CacheStat.misses + 1}
+    stats = session.query(CacheStat).filter(CacheStat.name == name)
+    if stats.update(values, synchronize_session=False):
+        return
+    try:
+        with session.begin_nested():
+            session.add(CacheStat(name=name, hits=int(hit), misses=int(not hit), tokens_saved=tokens_saved if hit else 0))
+    except IntegrityError:
+        stats.update(values, synchronize_session=False)
+
+def get_extracted(sha256):
+    """Stored pages for a file hash as a DocumentText handle, or None; counts as a cache hit or miss."""
+    hit = has_text(sha256)
+    with WriteSession() as session:
+        _count(session, "extract", hit=hit)
+        session.commit()
+    return DocumentText(sha256) if hit else None
+
+def put_extracted(sha256, pages):
+    write_pages(sha256, pages)
+
+def llm_cache_key(model, prompt, **params):
+    payload = json.dumps({"model": model, "prompt": prompt, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get_llm_response(key):
+    """Return the cached response text for key, or None if absent or expired."""
+    with SessionLocal() as session:
+        row = session.get(LLMCache, key)
+        if row is not None:
+            session.expunge(row)
+    expired = row is not None and row.created_at < datetime.utcnow() - timedelta(hours=LLM_CACHE_TTL_HOURS)
+    # The lookup above doesn't wait for writers; only the bookkeeping below takes the write lock
+    with WriteSession() as session:
+        entries = session.query(LLMCache).filter(LLMCache.key == key)
+        if row is None or expired:
+            if expired:
+                entries.delete(synchronize_session=False)
+            _count(session, "llm", hit=False)
+            session.commit()
+            return None
+        entries.update({"last_used": datetime.utcnow()}, synchronize_session=False)
+        _count(session, "llm", hit=True, tokens_saved=(row.prompt_tokens or 0) + (row.completion_tokens or 0))
+        session.commit()
+        return row.response
+
+def put_llm_response(key, model, response, prompt_tokens=0, completion_tokens=0):
+    now = datetime.utcnow()
+    with WriteSession() as session:
+        try:
+            with session.begin_nested():
+                session.merge(LLMCache(
+                    key=key, model=model, response=response,
+                    prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                    created_at=now, last_used=now
+                ))
+        except IntegrityError:
+            pass  # an identical request finished concurrently and stored first
+        excess = session.query(LLMCache).count() - LLM_CACHE_MAX_ENTRIES
+        if excess > 0:
+            for row in session.query(LLMCache).order_by(LLMCache.last_used).limit(excess):
+                session.delete(row)
+        session.commit()
+
+def cache_stats(name):
+    with SessionLocal() as session:
+        stat = session.get(CacheStat, name)
+        if stat is None:
+            return {"hits": 0, "misses": 0, "tokens_saved": 0}
+        return {"hits": stat.hits, "misses": stat.misses, "tokens_saved": stat.tokens_saved or 0}
@@ -0,0 +1,92 @@
+"""Grouping of near-identical obligations across a council's documents.
+
+Several policies often impose the same duty ("complete privacy training
+annually"). Every obligation text is embedded once, cached by its wording for
+all councils, as a unit-length float32 vector. Each council keeps a list of
+clusters with a running sum of their members' vectors: a new obligation joins
+the cluster whose centroid is most similar, if the cosine similarity reaches
+OBLIGATION_SIMILARITY_THRESHOLD, and starts a new cluster otherwise. An upload
+costs one matrix-vector product per new obligation against the council's
+centroids; existing assignments are never recomputed.
+"""
+import hashlib
+import os
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from db import SessionLocal, WriteSession, ObligationEmbedding, ObligationCluster
+from llm import embed, EMBEDDING_MODEL
+
+OBLIGATION_SIMILARITY_THRESHOLD = float(os.getenv("OBLIGATION_SIMILARITY_THRESHOLD", 0.9))
+
+def _key(text):
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\n{normalized}".encode("utf-8")).hexdigest()
+
+def _unit(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def _stored_vectors(session, keys):
+    if not keys:
+        return {}
+    rows = session.query(ObligationEmbedding.key, ObligationEmbedding.vector).filter(ObligationEmbedding.key.in_(set(keys)))
+    return {key: np.frombuffer(vector, dtype=np.float32) for key, vector in rows}
+
+def embed_obligations(texts):
+    """Compute and store embeddings for the texts that don't have one yet."""
+    texts = [text for text in texts if text and text.strip()]
+    keys = [_key(text) for text in texts]
+    with SessionLocal() as session:
+        stored = _stored_vectors(session, keys)
+    missing = {key: text for key, text in zip(keys, texts) if key not in stored}
+    if not missing:
+        return
+    vectors = _unit(embed(list(missing.values())))
+    with WriteSession() as session:
+        for key, vector in zip(missing, vectors):
+            try:
+                with session.begin_nested():
+                    session.add(ObligationEmbedding(key=key, vector=vector.astype(np.float32).tobytes()))
+            except IntegrityError:
+                pass  # embedded concurrently by another ingestion thread
+        session.commit()
+
+def assign_clusters(session, council, rows):
+    """Set "cluster_id" on new obligation rows (dicts with "text") within the caller's transaction.
+
+    Rows whose text has no stored embedding are left unclustered.
+    """
+    vectors = _stored_vectors(session, [_key(row["text"] or "") for row in rows])
+    if not vectors:
+        return
+    clusters = (
+        session.query(ObligationCluster)
+        .filter(ObligationCluster.council == council, ObligationCluster.model == EMBEDDING_MODEL)
+        .order_by(ObligationCluster.id)
+        .all()
+    )
+    dim = len(next(iter(vectors.values())))
+    sums = [np.frombuffer(cluster.vector_sum, dtype=np.float32).copy() for cluster in clusters]
+    centroids = _unit(np.stack(sums)) if sums else np.empty((0, dim), dtype=np.float32)
+    changed = set()
+    for row in rows:
+        vector = vectors.get(_key(row["text"] or ""))
+        if vector is None:
+            continue
+        scores = centroids @ vector
+        best = int(np.argmax(scores)) if len(scores) else -1
+        if best < 0 or scores[best] < OBLIGATION_SIMILARITY_THRESHOLD:
+            cluster = ObligationCluster(council=council, model=EMBEDDING_MODEL, text=row["text"], size=0)
+            session.add(cluster)
+            session.flush()
+            clusters.append(cluster)
+            sums.append(np.zeros(dim, dtype=np.float32))
+            centroids = np.vstack([centroids, vector])
+            best = len(clusters) - 1
+        sums[best] += vector
+        centroids[best] = _unit(sums[best])
+        clusters[best].size += 1
+        changed.add(best)
+        row["cluster_id"] = clusters[best].id
+    for i in changed:
+        clusters[i].vector_sum = sums[i].tobytes()
@@ -0,0 +1,108 @@
+import html
+from functools import lru_cache
+import numpy as np
+
+CARDS_PER_PAGE = 25
+
+CARD_CSS = """
+<style>
+.ob-card {background:#fff;border-radius:18px;box-shadow:0 2px 14px #1966b222;margin-bottom:20px;padding:22px 22px 16px 22px;}
+.ob-title {font-size:1.09em; font-weight:600; color:#1966b2;}
+.ob-done {color:#59c12a; font-weight:700;}
+.ob-chip {display:inline-block; background:#e3f2fd; color:#1764a7; border-radius:9px; padding:2px 11px 3px 11px; margin-right:7px; font-size:0.97em;}
+.ob-overdue {background:#e65c5c; color:#fff;}
+.ob-upcoming {background:#f3c852; color:#444;}
+</style>
+"""
+
+STATUS_FILTERS = ["All", "Open", "Done"]
+DEADLINE_BUCKETS = {"all": "Any deadline", "overdue": "Overdue", "soon": "Due soon", "later": "Later", "none": "No deadline"}
+
+def deadline_buckets(frame):
+    """overdue / soon from classify_deadlines, otherwise later (has a date) or none."""
+    return np.where(frame["status"] != "none", frame["status"], np.where(frame["next_due"].notna(), "later", "none"))
+
+def filter_cards(frame, doc_ids=None, status="All", bucket="all"):
+    mask = np.ones(len(frame), dtype=bool)
+    if doc_ids:
+        mask &= frame["doc_id"].isin(doc_ids).to_numpy()
+    if status == "Open":
+        mask &= ~frame["done"].to_numpy()
+    elif status == "Done":
+        mask &= frame["done"].to_numpy()
+    if bucket != "all":
+        mask &= deadline_buckets(frame) == bucket
+    return frame[mask]
+
+_URGENCY = {"overdue": 0, "soon": 1}
+
+def group_similar(frame):
+    """One row per cluster of similar obligations; obligations without a cluster stay on their own.
+
+    Each cluster is shown through its most urgent member (overdue, then due
+    soon, then earliest due) with the cluster's first wording. "sources" lists
+    the files of all members, and a cluster is done only when every member is.
+    """
+    key = frame["cluster_id"].fillna(-frame["id"])  # ids are positive, so unclustered rows get unique keys
+    ordered = frame.assign(_key=key, _urgency=frame["status"].map(_URGENCY).fillna(2)).sort_values(["_urgency", "next_due"], kind="stable")
+    grouped = frame.groupby(key, sort=False)
+    sources = {}
+    for group, file in zip(ordered["_key"], ordered["file"]):
+        sources.setdefault(group, {})[file] = None  # a dict keeps first-seen order; groupby().agg(tuple) is ~50x slower
+    representatives = ordered.drop_duplicates("_key")
+    return representatives.assign(
+        text=representatives["_key"].map(grouped["text"].first()),
+        done=representatives["_key"].map(grouped["done"].all()),
+        sources=[tuple(sources[group]) for group in representatives["_key"]]
+    ).drop(columns=["_key", "_urgency"]).sort_index()
+
+# Fragments are memoized on exactly the fields they display, so a rerun only
+# builds HTML for cards whose state changed since they were last rendered.
+@lru_cache(maxsize=4096)
+def render_doc_header(filename, summary):
+    return (
+        f"<div class='ob-title'>📑 {html.escape(filename)}</div>"
+        f"<div style='margin-bottom:8px;color:#1565c0;font-size:1.06em;'><b>Summary:</b> {html.escape(summary or '')}</div>"
+    )
+
+@lru_cache(maxsize=16384)
+def render_card(text, done, status, deadline, responsible, assigned_to, also_in=()):
+    chip_class = "ob-chip"
+    if status == "overdue":
+        chip_class += " ob-overdue"
+    elif status == "soon":
+        chip_class += " ob-upcoming"
+    status_icon = "✅" if done else "⬜️"
+    label = 'Overdue' if status == 'overdue' else ('Due soon' if status == 'soon' else 'Deadline')
+    responsible_chip = f'<span class="ob-chip">Responsible: {html.escape(responsible)}</span>' if responsible else ''
+    also_in_note = (
+        f'<div style="margin-top:6px;color:#555;font-size:0.93em;">Also in: {html.escape(", ".join(also_in))}</div>' if also_in else ''
+    )
+    return (
+        f'<div class="ob-card">'
+        f'<span style="font-size:1.23em;">{status_icon}</span>'
+        f'<b style="margin-left:7px;">{html.escape(text or "")}</b><br>'
+        f'<span class="{chip_class}">{label}</span>'
+        f'<span class="ob-chip">{html.escape(deadline or "")}</span>'
+        f'{responsible_chip}'
+        f'<span class="ob-chip" style="background:#e3ffd6;color:#388e3c;">Assigned: {html.escape(assigned_to or "")}</span>'
+        f'{also_in_note}'
+        f'</div>'
+    )
+
+def render_cards(page, summaries):
+    """One HTML block for a page of obligation rows, with a header whenever the document changes.
+
+    Rows from group_similar also name the other files their obligation appears in.
+    """
+    parts = []
+    current_doc = None
+    sources = page["sources"] if "sources" in page else [()] * len(page)
+    for doc_id, fname, text, done, status, deadline, responsible, assigned_to, files in zip(
+        page["doc_id"], page["file"], page["text"], page["done"], page["status"], page["deadline"], page["responsible"], page["assigned_to"], sources
+    ):
+        if doc_id != current_doc:
+            parts.append(render_doc_header(fname, summaries.get(doc_id, "")))
+            current_doc = doc_id
+        parts.append(render_card(text, bool(done), status, deadline, responsible, assigned_to, tuple(f for f in files if f != fname)))
+    return "".join(parts)
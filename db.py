@@ -1,12 +1,32 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, ForeignKey
+from sqlalchemy import create_engine, event, inspect, update, Column, Integer, String, Text, Boolean, ForeignKey, DateTime, Date, Index, Float, LargeBinary
 from sqlalchemy.orm import sessionmaker, declarative_base, relationship
 import os
+from datetime import datetime
 
 # For SQLite local dev
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///policysimplify.db")
 
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, connect_args={"timeout": 30} if DATABASE_URL.startswith("sqlite") else {})
+
+if DATABASE_URL.startswith("sqlite"):
+    # The driver's own transaction handling is turned off so BEGIN is issued here. Reads
+    # get a deferred BEGIN and never wait for writers (WAL). Every transaction that writes
+    # runs on write_engine (WriteSession) and takes the write lock up front (BEGIN
+    # IMMEDIATE): a deferred transaction that has read (including FTS5's own reads of its
+    # shadow tables) fails at once as locked, without waiting, if another writer got in first.
+    @event.listens_for(engine, "connect")
+    def _sqlite_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def _sqlite_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.get_execution_options().get("sqlite_immediate") else "BEGIN")
+
+write_engine = engine.execution_options(sqlite_immediate=True)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+WriteSession = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
 Base = declarative_base()
 
 class CouncilUser(Base):
@@ -20,11 +40,174 @@ class CouncilUser(Base):
 class PolicyDoc(Base):
     __tablename__ = "docs"
     id = Column(Integer, primary_key=True, index=True)
+    council = Column(String, index=True)
     filename = Column(String)
+    sha256 = Column(String(64), index=True)  # same key as the text store and search_index
+    gcs_url = Column(String)
     summary = Column(Text)
-    obligations = Column(Text)  # Store as JSON string
+    upload_time = Column(DateTime, default=datetime.utcnow, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("CouncilUser", back_populates="docs")
+    obligations = relationship("Obligation", back_populates="doc", order_by="Obligation.position", cascade="all, delete-orphan")
+    __table_args__ = (Index("ix_docs_council_filename", "council", "filename"),)
+
+class Obligation(Base):
+    __tablename__ = "obligations"
+    id = Column(Integer, primary_key=True, index=True)
+    doc_id = Column(Integer, ForeignKey("docs.id"), index=True, nullable=False)
+    position = Column(Integer)  # order within the document's obligation list
+    text = Column(Text)
+    deadline = Column(String)  # deadline (and recurrence) as written by the model
+    responsible = Column(String, default="")  # responsible party named by the policy, unlike assigned_to
+    cluster_id = Column(Integer, ForeignKey("obligation_clusters.id"), index=True)  # near-identical obligations share one (see clusters.py)
+    due_date = Column(Date, index=True)
+    recurrence_days = Column(Integer)
+    assigned_to = Column(String, default="", index=True)
+    done = Column(Boolean, default=False, index=True)
+    timestamp = Column(DateTime)
+    doc = relationship("PolicyDoc", back_populates="obligations")
+
+class AuditLog(Base):
+    __tablename__ = "audit"
+    id = Column(Integer, primary_key=True, index=True)
+    council = Column(String, index=True)
+    action = Column(String)
+    filename = Column(String)
+    obligation = Column(Text)
+    who = Column(String)
+    time = Column(DateTime, default=datetime.utcnow, index=True)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    council = Column(String, index=True)
+    kind = Column(String, default="ingest")
+    filename = Column(String)
+    sha256 = Column(String(64))  # uploaded bytes are kept at UPLOAD_DIR/<sha256>.pdf until the job finishes
+    status = Column(String, default="queued", index=True)  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    progress = Column(Float, default=0.0)
+    message = Column(String, default="")
+    error = Column(Text)
+    doc_id = Column(Integer, ForeignKey("docs.id"))
+    locked_by = Column(String)
+    heartbeat = Column(DateTime)
+    available_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Metric(Base):
+    __tablename__ = "metrics"
+    id = Column(Integer, primary_key=True, index=True)
+    stage = Column(String, index=True)  # startup, extract, llm, llm_cache_hit, llm_batch, embed, parse, search, dashboard, chat
+    council = Column(String, index=True)
+    started_at = Column(DateTime, default=datetime.utcnow, index=True)
+    duration_ms = Column(Float)  # None for token/cost-only rows (llm_batch)
+    model = Column(String)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    cost_usd = Column(Float, default=0.0)
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    council = Column(String, primary_key=True)
+    version = Column(Integer, default=0)  # bumped on every write to the council's docs, obligations or audit log
+
+class CacheStat(Base):
+    __tablename__ = "cache_stats"
+    name = Column(String, primary_key=True)
+    hits = Column(Integer, default=0)
+    misses = Column(Integer, default=0)
+    tokens_saved = Column(Integer, default=0)
+
+class LLMCache(Base):
+    __tablename__ = "llm_cache"
+    key = Column(String(64), primary_key=True)  # SHA-256 of model, prompt and parameters
+    model = Column(String)
+    response = Column(Text)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used = Column(DateTime, default=datetime.utcnow, index=True)
+
+class PassageIndex(Base):
+    __tablename__ = "passage_index"
+    sha256 = Column(String(64), primary_key=True)  # SHA-256 of the uploaded file, as in the text store
+    data = Column(Text)  # JSON: passages plus per-passage term counts (see retrieval.py)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Processing results shared by every council that uploads the same content (see dedupe.py).
+# Only council-neutral fields are stored; done / assigned / timestamps live on each council's obligations.
+class SharedResult(Base):
+    __tablename__ = "shared_results"
+    sha256 = Column(String(64), primary_key=True)
+    summary = Column(Text)
+    obligations = Column(Text)  # JSON list of {"text", "deadline", "responsible", "recurrence"}
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChunkResult(Base):
+    __tablename__ = "chunk_results"
+    key = Column(String(64), primary_key=True)  # response cache key of the chunk's request (ingest.chunk_key)
+    summary = Column(Text)
+    obligations = Column(Text)
+    minhash = Column(LargeBinary)  # uint32 MinHash of the chunk text; None until indexed, and for copies
+    copied_from = Column(String(64))  # key of the near-identical chunk whose result this is (see dedupe.py)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ChunkBucket(Base):
+    __tablename__ = "chunk_buckets"
+    id = Column(Integer, primary_key=True)
+    bucket = Column(String(32), index=True)  # band number plus hash of that band of the signature
+    key = Column(String(64), index=True)
+
+# Obligation embeddings, shared by every council; stored once per distinct text (see clusters.py)
+class ObligationEmbedding(Base):
+    __tablename__ = "obligation_embeddings"
+    key = Column(String(64), primary_key=True)  # SHA-256 of embedding model and normalized obligation text
+    vector = Column(LargeBinary)  # float32, unit length
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ObligationCluster(Base):
+    __tablename__ = "obligation_clusters"
+    id = Column(Integer, primary_key=True)
+    council = Column(String, index=True)
+    model = Column(String)  # embedding model; clusters from another model are not matched against
+    text = Column(Text)  # canonical wording: the first member's text
+    vector_sum = Column(LargeBinary)  # float32 sum of member embeddings; its direction is the centroid
+    size = Column(Integer, default=0)
+
+# Full-text index over summaries, obligations and page text (see search.py).
+# sha256 ties rows to a document (same key as the text store); ref is the
+# obligation index or page number.
+SEARCH_INDEX_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    sha256 UNINDEXED, kind UNINDEXED, ref UNINDEXED, body,
+    tokenize = 'porter unicode61'
+)
+"""
+
+def _add_missing_columns():
+    # create_all only creates tables; columns added to an existing table are added here
+    with write_engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
 
 def create_db():
-    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    Base.metadata.create_all(bind=write_engine)
+    with write_engine.begin() as conn:
+        # Batch replies used to be recorded as 0 ms spans, which skewed the latency percentiles
+        conn.execute(update(Metric).where(Metric.stage == "llm_batch", Metric.duration_ms == 0).values(duration_ms=None))
+    if engine.dialect.name == "sqlite":
+        with write_engine.begin() as conn:
+            conn.exec_driver_sql(SEARCH_INDEX_SCHEMA)
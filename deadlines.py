@@ -0,0 +1,120 @@
+import calendar
+import re
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from dateutil import parser as date_parser
+
+DUE_SOON_DAYS = 7
+REMINDER_LIMIT = 25
+
+_UNIT_DAYS = {"day": 1, "week": 7, "fortnight": 14, "month": 30, "quarter": 91, "year": 365}
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12, "fourteen": 14, "thirty": 30
+}
+_RECURRING_WORDS = {
+    "daily": 1, "weekly": 7, "fortnightly": 14, "monthly": 30, "quarterly": 91,
+    "annually": 365, "annual": 365, "yearly": 365, "biannually": 182
+}
+_QUANTITY = r"(\d+|" + "|".join(_NUMBER_WORDS) + r")"
+_UNIT = r"(day|week|fortnight|month|quarter|year)s?"
+_OFFSET_RE = re.compile(r"\bwithin\s+" + _QUANTITY + r"\s+(business\s+|working\s+|calendar\s+)?" + _UNIT)
+_EVERY_RE = re.compile(r"\b(?:every|each)\s+(?:" + _QUANTITY + r"\s+)?" + _UNIT)
+_DATE_HINT_RE = re.compile(
+    r"\b\d{1,2}[/-]\d{1,2}([/-]\d{2,4})?\b|\b\d{4}-\d{2}-\d{2}\b|"
+    r"\b(jan(uary)?|feb(ruary)?|mar(ch)?|apr(il)?|june?|july?|aug(ust)?|sept?(ember)?|oct(ober)?|nov(ember)?|dec(ember)?)\b|"
+    r"\b\d{1,2}(st|nd|rd|th)?\s+may\b|\bmay\s+\d{1,4}\b"  # "may" alone is usually the verb
+)
+
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+_MONTHS["sept"] = 9
+_END_OF_MONTH_RE = re.compile(r"\bend\s+of\s+(?:the\s+month\s+of\s+)?(" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\b(?:\s+(\d{4}))?")
+
+def _quantity(token):
+    return int(token) if token.isdigit() else _NUMBER_WORDS[token]
+
+def _explicit_date(text, reference):
+    """The date written in text ("by 30 June", "31/12", "end of May"), or None; the year defaults to reference's."""
+    match = _END_OF_MONTH_RE.search(text)
+    if match:
+        year = int(match.group(2) or reference.year)
+        month = _MONTHS[match.group(1)]
+        return reference.replace(year=year, month=month, day=calendar.monthrange(year, month)[1])
+    # Models often write ISO dates, which dayfirst parsing below would read as year-day-month
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        try:
+            return datetime(*map(int, match.groups()))
+        except ValueError:
+            pass
+    # Model output often repeats the date, e.g. "by 30 June (by 30 June, Finance)"; parse one clause at a time
+    for clause in re.split(r"[();,]", text):
+        if _DATE_HINT_RE.search(clause):
+            try:
+                return date_parser.parse(clause, fuzzy=True, dayfirst=True, default=reference.replace(day=1))
+            except (ValueError, OverflowError):
+                continue
+    return None
+
+def _recurring(text, match, period, reference):
+    # An explicit date ("annually by 30 September") is the first due date; otherwise one period from now.
+    # The recurrence itself is cut out first so "every 2 years" isn't read as the year 2.
+    rest = text[:match.start()] + " " + text[match.end():]
+    first = _explicit_date(rest, reference) or reference + timedelta(days=period)
+    return {"due_date": first.date().isoformat(), "recurrence_days": period}
+
+def parse_deadline(deadline_str, reference=None):
+    """Normalize a free-text deadline relative to reference (the upload time).
+
+    Returns {"due_date": ISO date or None, "recurrence_days": int or None}.
+    Offsets ("within 30 days", "within 5 business days") resolve to reference
+    + offset; recurrences ("every year", "annually by 30 September") store
+    their first due date and period.
+    """
+    reference = reference or datetime.now()
+    text = (deadline_str or "").lower()
+    if not text:
+        return {"due_date": None, "recurrence_days": None}
+
+    match = _EVERY_RE.search(text)
+    if match:
+        return _recurring(text, match, _quantity(match.group(1) or "1") * _UNIT_DAYS[match.group(2)], reference)
+    for word, period in _RECURRING_WORDS.items():
+        match = re.search(rf"\b{word}\b", text)
+        if match:
+            return _recurring(text, match, period, reference)
+
+    match = _OFFSET_RE.search(text)
+    if match:
+        count = _quantity(match.group(1))
+        if (match.group(2) or "").strip() in ("business", "working") and match.group(3) == "day":
+            due = np.busday_offset(reference.date(), count, roll="forward").astype(object)
+        else:
+            due = (reference + timedelta(days=count * _UNIT_DAYS[match.group(3)])).date()
+        return {"due_date": due.isoformat(), "recurrence_days": None}
+
+    date = _explicit_date(text, reference)
+    return {"due_date": date.date().isoformat() if date else None, "recurrence_days": None}
+
+def describe_deadline(deadline, recurrence=""):
+    """Deadline as shown to staff, with the recurrence appended unless the deadline already says it."""
+    if recurrence and recurrence.lower() not in deadline.lower():
+        return f"{deadline}, {recurrence}" if deadline else recurrence
+    return deadline
+
+def classify_deadlines(frame, now=None):
+    """Vectorized overdue / due-soon classification; recurring deadlines roll forward to their next occurrence."""
+    now = pd.Timestamp(now or datetime.now()).normalize()
+    due = frame["due"]
+    period = pd.to_timedelta(frame["recurrence_days"], unit="D")
+    periods_elapsed = np.ceil((now - due) / period).clip(lower=0).fillna(0)
+    next_due = due.where(period.isna(), due + period * periods_elapsed)
+    status = np.select(
+        [next_due < now, next_due <= now + pd.Timedelta(days=DUE_SOON_DAYS)],
+        ["overdue", "soon"],
+        default="none"
+    )
+    return frame.assign(next_due=next_due, status=status)
@@ -0,0 +1,166 @@
+"""Shared processing results across councils.
+
+Many councils upload the same state-issued templates. A document is processed
+once per distinct file: the summary and obligation texts are stored under its
+SHA-256 and copied into each council's own obligations, which carry that
+council's done / assigned / timestamp state.
+
+Chunk results are shared the same way, by exact (whitespace-normalized) chunk
+text and, failing that, by near-identical text: every summarized chunk gets a
+MinHash signature over its word shingles, bucketed with LSH, and a new chunk
+whose signature is at least NEAR_DUPLICATE_THRESHOLD similar to a stored one
+reuses its result. So a template that differs from another council's copy only
+by the council name or a page footer, or a revision, re-summarizes only the
+chunks that really changed. Chunk boundaries are picked by anchor_hash, which
+such small edits rarely move (see ingest.ends_chunk).
+"""
+import hashlib
+import json
+import os
+import re
+import zlib
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from db import SessionLocal, WriteSession, SharedResult, ChunkResult, ChunkBucket
+from extraction import ExtractedObligation, extraction_result
+
+NUM_PERM = 128
+LSH_BANDS = 16  # 8 rows per band: pairs above ~0.7 Jaccard similarity usually share a bucket
+SHINGLE_WORDS = 5
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.9))
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(17)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+def _shingle_hashes(text):
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 1))} if words else set()
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) % _PRIME for s in shingles), dtype=np.uint64, count=len(shingles))
+
+def anchor_hash(text):
+    """Smallest shingle hash of text (0 without words); unchanged unless an edit touches that one shingle."""
+    hashes = _shingle_hashes(text)
+    return int(hashes.min()) if len(hashes) else 0
+
+def minhash(text):
+    """MinHash signature (uint32[NUM_PERM]) of text's word shingles, or None if it has no words."""
+    hashes = _shingle_hashes(text)
+    if not len(hashes):
+        return None
+    signature = np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    for start in range(0, len(hashes), 4096):
+        block = hashes[start:start + 4096, None]
+        signature = np.minimum(signature, ((block * _A + _B) % _PRIME).min(axis=0))
+    return signature.astype(np.uint32)
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+def _buckets(signature):
+    rows = NUM_PERM // LSH_BANDS
+    return [
+        f"{band:02d}" + hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).hexdigest()
+        for band in range(LSH_BANDS)
+    ]
+
+def _neutral(result):
+    return {
+        "summary": result["summary"],
+        "obligations": json.dumps([ExtractedObligation.model_validate(o).model_dump() for o in result["obligations"]])
+    }
+
+def _restore(summary, obligations):
+    # Relative deadlines ("within 30 days") are resolved against today, not the original upload
+    return extraction_result(summary, [ExtractedObligation.model_validate(o) for o in json.loads(obligations)])
+
+def get_shared_result(sha256):
+    with SessionLocal() as session:
+        row = session.get(SharedResult, sha256)
+        return _restore(row.summary, row.obligations) if row is not None else None
+
+def save_shared_result(sha256, result):
+    with WriteSession() as session:
+        try:
+            with session.begin_nested():
+                session.add(SharedResult(sha256=sha256, **_neutral(result)))
+        except IntegrityError:
+            pass  # the same file was processed concurrently and stored first
+        session.commit()
+
+def get_chunk_result(key):
+    with SessionLocal() as session:
+        row = session.get(ChunkResult, key)
+        return _restore(row.summary, row.obligations) if row is not None else None
+
+def _near_duplicate_chunk(signature, threshold=NEAR_DUPLICATE_THRESHOLD):
+    # Only chunks that were summarized themselves are candidates, so reuse never drifts through a chain of copies
+    with SessionLocal() as session:
+        candidates = [key for key, in (
+            session.query(ChunkBucket.key)
+            .filter(ChunkBucket.bucket.in_(_buckets(signature)))
+            .group_by(ChunkBucket.key)
+            .order_by(func.count().desc())
+            .limit(20)
+        )]
+        if not candidates:
+            return None
+        rows = (
+            session.query(ChunkResult.key, ChunkResult.minhash)
+            .filter(ChunkResult.key.in_(candidates), ChunkResult.copied_from.is_(None), ChunkResult.minhash.isnot(None))
+            .all()
+        )
+    scored = [(key, similarity(signature, np.frombuffer(blob, dtype=np.uint32))) for key, blob in rows]
+    best = max(scored, key=lambda item: item[1], default=None)
+    return best[0] if best and best[1] >= threshold else None
+
+def find_chunk_result(key, chunk):
+    """Result stored for the chunk, or for a near-identical chunk (then also saved under key), or None."""
+    with SessionLocal() as session:
+        row = session.get(ChunkResult, key)
+        found = (_restore(row.summary, row.obligations), row.minhash is None and row.copied_from is None) if row is not None else None
+    if found is not None:
+        result, unindexed = found
+        if unindexed:
+            _index_chunk(key, chunk)  # stored by batch.py, which only has the key
+        return result
+    signature = minhash(chunk)
+    match = _near_duplicate_chunk(signature) if signature is not None else None
+    if match is None:
+        return None
+    result = get_chunk_result(match)
+    save_chunk_result(key, result, copied_from=match)
+    return result
+
+def _add_buckets(session, key, signature):
+    session.add_all(ChunkBucket(bucket=bucket, key=key) for bucket in _buckets(signature))
+
+def _index_chunk(key, chunk):
+    signature = minhash(chunk)
+    if signature is None:
+        return
+    with WriteSession() as session:
+        indexed = session.query(ChunkResult).filter(ChunkResult.key == key, ChunkResult.minhash.is_(None)).update(
+            {"minhash": signature.tobytes()}, synchronize_session=False
+        )
+        if indexed:
+            _add_buckets(session, key, signature)
+        session.commit()
+
+def save_chunk_result(key, result, chunk=None, copied_from=None):
+    """Store a chunk's result; with the chunk text it is also indexed for near-duplicate lookups."""
+    signature = minhash(chunk) if chunk else None
+    with WriteSession() as session:
+        try:
+            with session.begin_nested():
+                session.add(ChunkResult(
+                    key=key, minhash=signature.tobytes() if signature is not None else None, copied_from=copied_from, **_neutral(result)
+                ))
+                if signature is not None:
+                    _add_buckets(session, key, signature)
+        except IntegrityError:
+            pass
+        session.commit()
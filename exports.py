@@ -0,0 +1,76 @@
+import glob
+import hashlib
+import os
+import re
+import threading
+
+# Exports are written on demand, chunk by chunk, to files keyed by the council's
+# data version, so an unchanged table is serialized once however often it is downloaded.
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 5000))
+
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+def frame_chunks(frame, size=EXPORT_CHUNK_ROWS):
+    """Slice an in-memory DataFrame into chunks (at least one, possibly empty)."""
+    for start in range(0, max(len(frame), 1), size):
+        yield frame.iloc[start:start + size]
+
+def write_csv(chunks, path):
+    with open(path, "w", newline="") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=i == 0)
+
+def write_parquet(chunks, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for chunk in chunks:
+            # Text columns as strings, so an all-empty column in one chunk doesn't change the schema
+            chunk = chunk.astype({c: "string" for c in chunk.columns if chunk[c].dtype == object})
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet}
+
+def _slug(value):
+    return re.sub(r"[^a-z0-9]+", "-", str(value).lower()).strip("-")
+
+def export_path(kind, council, version, fmt, key=""):
+    # key distinguishes filtered views (e.g. a search) of the same table
+    key = key and hashlib.sha1(key.encode()).hexdigest()[:12]
+    name = "-".join(filter(None, [_slug(kind), _slug(council), key]))
+    return os.path.join(EXPORT_DIR, f"{name}-v{version}.{fmt}")
+
+def cached_export(kind, council, version, fmt, chunks, key=""):
+    """Path of the export file, writing it from chunks() only if this version isn't on disk yet.
+
+    Files for older versions of the same council and kind are removed once the
+    new one is in place.
+    """
+    path = export_path(kind, council, version, fmt, key)
+    if not os.path.exists(path):
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        WRITERS[fmt](chunks(), tmp_path)
+        os.replace(tmp_path, path)
+        prefix = os.path.join(EXPORT_DIR, f"{_slug(kind)}-{_slug(council)}-")
+        for old in glob.glob(f"{glob.escape(prefix)}*.{fmt}"):
+            if not old.endswith(f"-v{version}.{fmt}"):
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass  # another session pruned it first
+    return path
+
+def read_export(kind, council, version, fmt, chunks, key=""):
+    with open(cached_export(kind, council, version, fmt, chunks, key), "rb") as f:
+        return f.read()
@@ -0,0 +1,102 @@
+"""Structured obligation extraction: the JSON schema the model must follow and its validation.
+
+Replies are validated with pydantic's Rust JSON parser. A reply cut off by
+max_tokens still yields every obligation that arrived complete, and the caller
+asks the model to continue from there (see ingest.extract_chunk).
+"""
+from pydantic import BaseModel, ConfigDict, ValidationError
+from pydantic_core import from_json
+from deadlines import parse_deadline
+
+class ExtractedObligation(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    text: str
+    deadline: str = ""
+    responsible: str = ""
+    recurrence: str = ""
+
+class Extraction(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    summary: str = ""
+    obligations: list[ExtractedObligation] = []
+
+_FIELD = {"type": "string"}
+
+# Chat-completions response_format for strict, schema-constrained output
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "policy_obligations",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["summary", "obligations"],
+            "properties": {
+                "summary": _FIELD,
+                "obligations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "required": ["text", "deadline", "responsible", "recurrence"],
+                        "properties": {"text": _FIELD, "deadline": _FIELD, "responsible": _FIELD, "recurrence": _FIELD}
+                    }
+                }
+            }
+        }
+    }
+}
+
+def parse_extraction(content):
+    """Validate a model reply; returns (Extraction, complete).
+
+    complete is False when the JSON was truncated. The Extraction then holds
+    the summary and the obligations that arrived whole; a half-written
+    obligation is dropped so the continuation can repeat it. Items that don't
+    match the schema are skipped rather than failing the whole reply.
+    """
+    try:
+        data, complete = from_json(content), True
+    except ValueError:
+        try:
+            data, complete = from_json(content, allow_partial=True), False
+        except ValueError:
+            return Extraction(), True  # not JSON at all; nothing to continue from
+    if not isinstance(data, dict):
+        return Extraction(), True
+    items = data.get("obligations") or []
+    if not complete:
+        items = items[:-1]  # the last one may be missing fields that were cut off
+    obligations = []
+    for item in items:
+        try:
+            obligations.append(ExtractedObligation.model_validate(item))
+        except ValidationError:
+            pass
+    summary = data.get("summary")
+    return Extraction(summary=summary if isinstance(summary, str) else "", obligations=obligations), complete
+
+def extraction_result(summary, obligations):
+    """The {"summary", "obligations"} result the ingestion pipeline passes around."""
+    return {"summary": summary.strip(), "obligations": [obligation_record(o) for o in obligations]}
+
+def obligation_record(item):
+    """Obligation dict as stored per council: extracted fields, parsed dates and empty task state."""
+    dates = parse_deadline(item.deadline)
+    if item.recurrence:
+        recurring = parse_deadline(item.recurrence)
+        dates = {
+            "due_date": dates["due_date"] or recurring["due_date"],
+            "recurrence_days": recurring["recurrence_days"] or dates["recurrence_days"]
+        }
+    return {
+        "text": item.text.strip(),
+        "deadline": item.deadline.strip(),
+        "responsible": item.responsible.strip(),
+        "recurrence": item.recurrence.strip(),
+        **dates,
+        "done": False,
+        "assigned_to": "",
+        "timestamp": None
+    }
@@ -0,0 +1,281 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import PyPDF2
+from cache import file_sha256, get_extracted, put_extracted, llm_cache_key
+from llm import ai_summarize, ai_continue_summary, ai_combine_summaries, summarize_prompt, MODEL, SUMMARIZE_PARAMS
+from dedupe import get_shared_result, save_shared_result, find_chunk_result, save_chunk_result, anchor_hash
+from retrieval import build_doc_index, save_doc_index, has_doc_index
+from search import index_search_document
+from pdftext import PdfPages, page_texts, PAGE_BREAK, EXTRACT_PAGE_TIMEOUT
+from extraction import parse_extraction, extraction_result
+from clusters import embed_obligations
+from metrics import span, record, in_scope
+
+# Number of files extracted and summarized at once; the token budget in llm.py still applies
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", 4))
+# Documents are summarized in chunks of whole pages, CHUNK_PAGES long on average and at most twice that
+CHUNK_PAGES = int(os.getenv("CHUNK_PAGES", 2))
+CHUNK_MAX_PAGES = 2 * CHUNK_PAGES
+CHUNK_MAX_CHARS = 5000  # matches the window ai_summarize sends to the model
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", 4))
+# Follow-up requests for a chunk whose JSON reply was truncated
+LLM_MAX_CONTINUATIONS = int(os.getenv("LLM_MAX_CONTINUATIONS", 3))
+# Job progress is written at most this often while a long PDF streams through
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+def extract_pdf_text(pdf_file):
+    """Page texts joined with PAGE_BREAK, extracted serially (bulk_ingest.py runs one file per process)."""
+    return PAGE_BREAK.join(text or "" for text in page_texts(lambda: PyPDF2.PdfReader(pdf_file)))
+
+def parse_obligations(ai_response):
+    """Summary and obligation records from one JSON model reply (whatever arrived, if it was truncated)."""
+    with span("parse"):
+        extraction, _ = parse_extraction(ai_response)
+        return extraction_result(extraction.summary, extraction.obligations)
+
+def extract_chunk(chunk):
+    """Summarize one chunk, asking the model to continue whenever its reply was cut off by max_tokens."""
+    reply = ai_summarize(chunk)
+    with span("parse"):
+        extraction, complete = parse_extraction(reply)
+    obligations = list(extraction.obligations)
+    for _ in range(LLM_MAX_CONTINUATIONS):
+        if complete:
+            break
+        reply = ai_continue_summary(chunk, [o.text for o in obligations])
+        with span("parse"):
+            more, complete = parse_extraction(reply)
+        obligations += more.obligations
+    return extraction_result(extraction.summary, obligations)
+
+def ends_chunk(page, pages_in_chunk):
+    """Whether a chunk that has reached this page (its pages_in_chunk-th) ends after it.
+
+    Boundaries are picked by page text (one page in CHUNK_PAGES, by hash) rather
+    than page number, so a page inserted into or removed from a revised policy
+    only changes the chunk around it: the other chunks keep identical text and
+    reuse their stored results. The hash is the page's smallest shingle hash, so
+    a different council name or footer rarely moves a boundary either, and the
+    near-identical chunks are matched in dedupe.find_chunk_result.
+    """
+    return pages_in_chunk >= CHUNK_MAX_PAGES or anchor_hash(page) % CHUNK_PAGES == 0
+
+def chunk_pages(pages, max_chars=CHUNK_MAX_CHARS):
+    """Group pages into chunks at ends_chunk boundaries, splitting any chunk longer than max_chars."""
+    chunks, start = [], 0
+    for i, page in enumerate(pages):
+        if ends_chunk(page, i + 1 - start):
+            chunks += _range_chunks(pages[start:i + 1], max_chars)
+            start = i + 1
+    chunks += _range_chunks(pages[start:], max_chars)
+    return chunks or [""]
+
+def _range_chunks(range_pages, max_chars=CHUNK_MAX_CHARS):
+    # Whitespace and blank lines are layout, not content: normalized so re-exported copies share a key.
+    # Long ranges are split at page ends, so a longer council name or footer doesn't shift every cut after it.
+    chunks, text = [], ""
+    for page in range_pages:
+        page = "\n".join(line for line in (" ".join(line.split()) for line in page.splitlines()) if line)
+        if not page:
+            continue
+        if text and len(text) + 1 + len(page) > max_chars:
+            chunks.append(text)
+            text = ""
+        text = f"{text}\n{page}" if text else page
+        while len(text) > max_chars:
+            chunks.append(text[:max_chars])
+            text = text[max_chars:]
+    return chunks + [text] if text else chunks
+
+def _obligation_key(text):
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+def merge_results(parts):
+    seen = set()
+    obligations = []
+    for part in parts:
+        for obl in part["obligations"]:
+            key = _obligation_key(obl["text"])
+            if key and key not in seen:
+                seen.add(key)
+                obligations.append(obl)
+    summaries = [part["summary"] for part in parts if part["summary"]]
+    summary = summaries[0] if len(summaries) == 1 else ai_combine_summaries(summaries) if summaries else ""
+    return {"summary": summary, "obligations": obligations}
+
+def summarize_document(pages, on_chunk_done=None):
+    """Map-reduce summarization: each chunk is summarized in parallel, then obligations are merged.
+
+    on_chunk_done(done, total) is called as chunk summaries come back.
+    """
+    chunks = chunk_pages(pages)
+    if len(chunks) == 1:
+        result = summarize_chunk(chunks[0])
+        if on_chunk_done:
+            on_chunk_done(1, 1)
+        return result
+    parts = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY) as pool:
+        futures = {pool.submit(in_scope(summarize_chunk), chunk): i for i, chunk in enumerate(chunks)}
+        for done, future in enumerate(as_completed(futures), 1):
+            parts[futures[future]] = future.result()
+            if on_chunk_done:
+                on_chunk_done(done, len(chunks))
+    return merge_results(parts)
+
+def summarize_stream(page_iter, pages, on_progress=None):
+    """Summarize a document while its pages are still being extracted.
+
+    Pages from page_iter are appended to pages, and each chunk (the same ones
+    chunk_pages would make) is submitted as soon as its last page arrives.
+    on_progress(pages_read, chunks_done) is called as either advances.
+    """
+    report = on_progress or (lambda pages_read, chunks_done: None)
+    futures = []
+    start = 0
+    with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY) as pool:
+        try:
+            for page in page_iter:
+                pages.append(page)
+                if ends_chunk(page, len(pages) - start):
+                    futures += [pool.submit(in_scope(summarize_chunk), chunk) for chunk in _range_chunks(pages[start:])]
+                    start = len(pages)
+                report(len(pages), sum(future.done() for future in futures))
+            futures += [pool.submit(in_scope(summarize_chunk), chunk) for chunk in _range_chunks(pages[start:])]
+            if not futures:
+                futures.append(pool.submit(in_scope(summarize_chunk), ""))
+            parts = []
+            for future in futures:
+                parts.append(future.result())
+                report(len(pages), len(parts))
+        except BaseException:
+            for future in futures:
+                future.cancel()  # don't pay for the rest of a document that failed
+            raise
+    return parts[0] if len(parts) == 1 else merge_results(parts)
+
+def chunk_key(chunk):
+    # Same key as the response cache uses for the chunk's request, so changing the prompt or
+    # output format re-extracts, and batch.py can hand a truncated reply to the live path
+    return llm_cache_key(MODEL, summarize_prompt(chunk), **SUMMARIZE_PARAMS)
+
+def summarize_chunk(chunk):
+    """Summary and obligations for one chunk, shared by every document (and council) containing the same text."""
+    key = chunk_key(chunk)
+    result = find_chunk_result(key, chunk)
+    if result is None:
+        result = extract_chunk(chunk)
+        save_chunk_result(key, result, chunk=chunk)
+    return result
+
+def index_document(sha256, pages):
+    """Build and persist the passage index for a document once."""
+    if not has_doc_index(sha256):
+        save_doc_index(sha256, build_doc_index(pages))
+
+def _embed(result):
+    # Embedded here, outside the database transaction that assigns clusters when the document is
+    # saved. Without embeddings the document is saved unclustered and the worker groups it later.
+    try:
+        embed_obligations([o["text"] for o in result["obligations"]])
+    except Exception as e:
+        print(f"Could not embed obligations, leaving them ungrouped for now: {e}", flush=True)
+
+def _reuse_shared(sha256, shared, report):
+    # Identical file already processed, possibly by another council
+    report(0.9, "Reused the summary of an identical policy")
+    _embed(shared)
+    return {**shared, "sha256": sha256}
+
+def _store_result(sha256, pages, result, report):
+    index_search_document(sha256, result, pages)
+    save_shared_result(sha256, result)
+    report(0.95, "Indexed for search")
+    _embed(result)
+    return {**result, "sha256": sha256}
+
+def process_pages(sha256, pages, on_progress=None):
+    """Index and summarize an already extracted document.
+
+    on_progress(fraction, message) is called between stages, for job status.
+    """
+    report = on_progress or (lambda fraction, message: None)
+    index_document(sha256, pages)
+    shared = get_shared_result(sha256)
+    if shared is not None:
+        return _reuse_shared(sha256, shared, report)
+    report(0.2, "Indexed passages")
+    result = summarize_document(pages, lambda done, total: report(0.2 + 0.7 * done / total, f"Summarized {done}/{total} section(s)"))
+    return _store_result(sha256, pages, result, report)
+
+def _timed_pages(stream):
+    start = time.perf_counter()
+    yield from stream
+    record("extract", (time.perf_counter() - start) * 1000)
+    for _ in stream.timed_out:
+        record("extract_timeout", EXTRACT_PAGE_TIMEOUT * 1000)
+
+def process_stream(sha256, stream, on_progress=None):
+    """Extract, summarize and index a new PDF, summarizing early pages while later ones are extracted.
+
+    stream is a PdfPages handle. The pages are put in the text store once all have arrived.
+    """
+    report = on_progress or (lambda fraction, message: None)
+    total = len(stream)
+    last_report = 0.0
+
+    def progress(pages_read, chunks_done):
+        nonlocal last_report
+        if time.monotonic() - last_report >= PROGRESS_INTERVAL_SECONDS:
+            last_report = time.monotonic()
+            # Half for extraction, half for summaries (about one per CHUNK_PAGES pages)
+            sections = max(-(-total // CHUNK_PAGES), 1)
+            done = (pages_read / max(total, 1) + min(chunks_done / sections, 1)) / 2
+            report(0.1 + 0.8 * done, f"Extracted {pages_read}/{total} page(s), summarized {chunks_done} section(s)")
+
+    pages = []
+    shared = get_shared_result(sha256)
+    if shared is None:
+        result = summarize_stream(_timed_pages(stream), pages, progress)
+    else:
+        pages += _timed_pages(stream)
+    put_extracted(sha256, pages)
+    if stream.timed_out:
+        report(0.9, f"{len(stream.timed_out)} page(s) took over {EXTRACT_PAGE_TIMEOUT:g}s to read and were left out")
+    index_document(sha256, pages)
+    if shared is not None:
+        return _reuse_shared(sha256, shared, report)
+    return _store_result(sha256, pages, result, report)
+
+def process_file(data, on_progress=None):
+    """Extract, index and summarize one PDF.
+
+    A file seen before is read back from the text store; a new one is
+    summarized while it is still being extracted.
+    """
+    sha256 = file_sha256(data)
+    stored = get_extracted(sha256)
+    if stored is None:
+        with PdfPages(data) as stream:
+            return process_stream(sha256, stream, on_progress)
+    with stored:
+        if on_progress:
+            on_progress(0.1, f"Extracted {len(stored)} page(s)")
+        return process_pages(sha256, stored, on_progress)
+
+def ingest_files(files, max_workers=INGEST_CONCURRENCY):
+    """Process (name, bytes) pairs concurrently.
+
+    Yields (name, result, error) as each file finishes, so callers can record
+    results without waiting for the whole batch.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(in_scope(process_file), data): name for name, data in files}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                yield name, future.result(), None
+            except Exception as e:
+                yield name, None, e
@@ -0,0 +1,151 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from cache import file_sha256
+from db import SessionLocal, WriteSession, Job
+
+# Uploaded PDFs wait here, content-addressed, until their job is done or has failed for good
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_SECONDS = float(os.getenv("JOB_RETRY_SECONDS", 30))
+# A running job whose worker hasn't sent a heartbeat for this long is put back in the queue
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 120))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+def upload_path(sha256):
+    return os.path.join(UPLOAD_DIR, f"{sha256}.pdf")
+
+def _store_upload(sha256, data):
+    path = upload_path(sha256)
+    if not os.path.exists(path):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+def _remove_upload(session, sha256):
+    # Runs in a write transaction, so enqueue_file's commit for the same file comes either
+    # before this check (and keeps the file) or after it (and stores the file again)
+    if session.query(Job.id).filter(Job.sha256 == sha256, Job.status.in_(ACTIVE_STATUSES)).first() is None:
+        try:
+            os.remove(upload_path(sha256))
+        except FileNotFoundError:
+            pass
+
+def read_upload(sha256):
+    with open(upload_path(sha256), "rb") as f:
+        return f.read()
+
+def enqueue_file(council, filename, data):
+    """Queue a file for ingestion; returns the job id.
+
+    A file already queued, running or done under the same council and name is
+    not queued twice, so repeated reruns of the page are harmless.
+    """
+    sha256 = file_sha256(data)
+    _store_upload(sha256, data)
+    with WriteSession() as session:
+        existing = (
+            session.query(Job)
+            .filter(Job.council == council, Job.filename == filename, Job.sha256 == sha256, Job.status != "failed")
+            .first()
+        )
+        if existing is not None:
+            _remove_upload(session, sha256)  # kept only while a job still needs it
+            return existing.id
+        job = Job(council=council, filename=filename, sha256=sha256, status="queued", available_at=datetime.utcnow())
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    _store_upload(sha256, data)  # a job for the same file may have finished and removed it just before the commit
+    return job_id
+
+def claim_job(worker_id):
+    """Atomically move the oldest available queued job to running; returns a detached Job or None."""
+    now = datetime.utcnow()
+    with WriteSession() as session:
+        job = (
+            session.query(Job)
+            .filter(Job.status == "queued", Job.available_at <= now)
+            .order_by(Job.available_at, Job.id)
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = session.query(Job).filter(Job.id == job.id, Job.status == "queued").update(
+            {"status": "running", "locked_by": worker_id, "heartbeat": now, "attempts": Job.attempts + 1,
+             "message": "Starting", "error": None},
+            synchronize_session=False
+        )
+        session.commit()
+        if not claimed:
+            return None  # another worker got there first
+        job = session.get(Job, job.id)
+        session.expunge(job)
+        return job
+
+def update_progress(job_id, progress, message=""):
+    with WriteSession() as session:
+        session.query(Job).filter(Job.id == job_id).update(
+            {"progress": progress, "message": message, "heartbeat": datetime.utcnow()}, synchronize_session=False
+        )
+        session.commit()
+
+def heartbeat(worker_id):
+    with WriteSession() as session:
+        session.query(Job).filter(Job.locked_by == worker_id, Job.status == "running").update(
+            {"heartbeat": datetime.utcnow()}, synchronize_session=False
+        )
+        session.commit()
+
+def complete_job(job_id, doc_id):
+    """Mark a job done and delete its uploaded file, unless another job is waiting for the same file."""
+    with WriteSession() as session:
+        job = session.get(Job, job_id)
+        job.status, job.progress, job.message, job.doc_id, job.locked_by = "done", 1.0, "Done", doc_id, None
+        session.flush()
+        _remove_upload(session, job.sha256)
+        session.commit()
+
+def fail_job(job_id, error):
+    """Requeue with linear backoff, or mark failed (and delete the upload) once JOB_MAX_ATTEMPTS is reached."""
+    with WriteSession() as session:
+        job = session.get(Job, job_id)
+        if job.attempts < JOB_MAX_ATTEMPTS:
+            job.status = "queued"
+            job.available_at = datetime.utcnow() + timedelta(seconds=JOB_RETRY_SECONDS * job.attempts)
+            job.message = f"Retrying after error (attempt {job.attempts} of {JOB_MAX_ATTEMPTS})"
+        else:
+            job.status = "failed"
+            job.message = "Failed"
+        job.error = str(error)
+        job.locked_by = None
+        session.flush()
+        if job.status == "failed":
+            _remove_upload(session, job.sha256)
+        session.commit()
+
+def requeue_stale_jobs():
+    """Return running jobs abandoned by a dead worker to the queue; returns how many."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    with WriteSession() as session:
+        count = session.query(Job).filter(Job.status == "running", Job.heartbeat < cutoff).update(
+            {"status": "queued", "locked_by": None, "message": "Requeued after worker stopped",
+             "available_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        session.commit()
+        return count
+
+def list_jobs(council, job_ids=None, statuses=None):
+    with SessionLocal() as session:
+        query = session.query(Job).filter(Job.council == council)
+        if job_ids is not None:
+            query = query.filter(Job.id.in_(list(job_ids)))
+        if statuses is not None:
+            query = query.filter(Job.status.in_(statuses))
+        jobs = query.order_by(Job.id).all()
+        session.expunge_all()
+        return jobs
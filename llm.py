@@ -0,0 +1,209 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+import numpy as np
+from dotenv import load_dotenv
+from cache import llm_cache_key, get_llm_response, put_llm_response
+from metrics import span, record
+from extraction import RESPONSE_FORMAT
+
+MODEL = "gpt-4o"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_BATCH = 256  # inputs per embeddings request
+
+load_dotenv()
+# Retries on 429/5xx are handled here rather than by the SDK so they share the token budget
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1.0))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30.0))
+# 0 disables client-side token-per-minute budgeting
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 30000))
+# Keep-alive HTTP connections shared by every thread (ingestion runs up to INGEST_CONCURRENCY x CHUNK_CONCURRENCY requests)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Process-wide OpenAI client over one pooled HTTP connection set.
+
+    The SDK (~0.7 s to import) is loaded here on first use rather than with
+    this module, so pages that never call the model don't pay for it.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import openai
+            # Limits comes from whichever HTTP library this SDK build is using
+            limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+                max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS, keepalive_expiry=60
+            )
+            # OPENAI_BASE_URL may point at a local stub (see stub_openai.py)
+            _client = openai.OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                max_retries=0,
+                http_client=openai.DefaultHttpxClient(limits=limits)
+            )
+    return _client
+
+class TokenBudget:
+    """Rolling one-minute token budget shared by all threads issuing requests."""
+
+    def __init__(self, tokens_per_minute):
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._window = deque()  # (monotonic time, tokens)
+
+    def acquire(self, tokens):
+        if not self.tokens_per_minute:
+            return
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._window and now - self._window[0][0] >= 60:
+                    self._window.popleft()
+                used = sum(t for _, t in self._window)
+                if used + tokens <= self.tokens_per_minute:
+                    self._window.append((now, tokens))
+                    return
+                wait = 60 - (now - self._window[0][0])
+            time.sleep(max(wait, 0.05))
+
+token_budget = TokenBudget(LLM_TOKENS_PER_MINUTE)
+
+# Process-wide totals of model calls, for throughput reports
+_usage_lock = threading.Lock()
+_usage = {"calls": 0, "cached_calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+def _record_usage(cached=False, prompt_tokens=0, completion_tokens=0):
+    with _usage_lock:
+        _usage["cached_calls" if cached else "calls"] += 1
+        _usage["prompt_tokens"] += prompt_tokens
+        _usage["completion_tokens"] += completion_tokens
+
+def token_usage():
+    with _usage_lock:
+        return dict(_usage)
+
+def estimate_tokens(prompt, max_tokens):
+    # ~4 characters per token for English text, plus the completion allowance
+    return len(prompt) // 4 + max_tokens
+
+def _retry_delay(attempt, error):
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(float(retry_after), LLM_BACKOFF_MAX)
+    except (TypeError, ValueError):
+        return min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def _create_with_retry(create=None, **kwargs):
+    create = create or get_client().chat.completions.create
+    import openai  # already loaded by get_client
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return create(**kwargs)
+        except openai.APIStatusError as e:
+            if (e.status_code != 429 and e.status_code < 500) or attempt == LLM_MAX_RETRIES:
+                raise
+            time.sleep(_retry_delay(attempt, e))
+        except openai.APIConnectionError as e:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            time.sleep(_retry_delay(attempt, e))
+
+def complete(prompt, model=MODEL, temperature=0.2, max_tokens=700, response_format=None):
+    """Single-turn chat completion, served from the response cache when possible."""
+    start = time.perf_counter()
+    params = {"temperature": temperature, "max_tokens": max_tokens}
+    if response_format is not None:
+        params["response_format"] = response_format
+    key = llm_cache_key(model, prompt, **params)
+    cached = get_llm_response(key)
+    if cached is not None:
+        _record_usage(cached=True)
+        record("llm_cache_hit", (time.perf_counter() - start) * 1000, model=model)
+        return cached
+    token_budget.acquire(estimate_tokens(prompt, max_tokens))
+    with span("llm", model=model) as fields:
+        response = _create_with_retry(model=model, messages=[{"role": "user", "content": prompt}], **params)
+        usage = response.usage
+        fields["prompt_tokens"] = prompt_tokens = usage.prompt_tokens if usage else 0
+        fields["completion_tokens"] = completion_tokens = usage.completion_tokens if usage else 0
+    content = response.choices[0].message.content.strip()
+    _record_usage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    put_llm_response(key, model, content, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return content
+
+def embed(texts, model=EMBEDDING_MODEL):
+    """Embeddings of texts as a float32 matrix, one row per text."""
+    rows = []
+    for start in range(0, len(texts), EMBEDDING_BATCH):
+        with span("embed", model=model) as fields:
+            response = _create_with_retry(get_client().embeddings.create, model=model, input=texts[start:start + EMBEDDING_BATCH])
+            fields["prompt_tokens"] = response.usage.prompt_tokens if response.usage else 0
+        rows += [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    return np.asarray(rows, dtype=np.float32).reshape(len(rows), -1)
+
+# Shared with batch.py so batch results land under the same cache keys
+SUMMARIZE_PARAMS = {"temperature": 0.2, "max_tokens": 1200, "response_format": RESPONSE_FORMAT}
+COMBINE_PARAMS = {"temperature": 0.2, "max_tokens": 300}
+
+def summarize_prompt(text):
+    return f"""
+You are a compliance AI assistant for Australian councils.
+Given the following policy document, reply in JSON with:
+
+- "summary": a plain-English summary (3-5 sentences).
+- "obligations": every compliance obligation, each with
+  - "text": what must be done, as one sentence
+  - "deadline": when it is due, as written (e.g. "by 30 June 2026", "within 30 days"); if none is given, suggest one if appropriate, otherwise ""
+  - "responsible": who is responsible, if stated or clear, otherwise ""
+  - "recurrence": how often it repeats (e.g. "every year", "quarterly"), otherwise ""
+Policy text:
+\"\"\"
+{text[:5000]}
+\"\"\"
+"""
+
+def ai_summarize(text):
+    return complete(summarize_prompt(text), **SUMMARIZE_PARAMS)
+
+def ai_continue_summary(text, listed):
+    """Ask for the obligations missing from a reply that was cut off after listing `listed`."""
+    already = "\n".join(f"- {item}" for item in listed) or "(none)"
+    prompt = summarize_prompt(text) + f"""
+Your previous reply was cut off. These obligations were already listed:
+{already}
+Reply in the same JSON format with only the obligations not listed above, and an empty "summary".
+"""
+    return complete(prompt, **SUMMARIZE_PARAMS)
+
+def combine_prompt(summaries):
+    sections = "\n\n".join(f"Section {i}: {summary}" for i, summary in enumerate(summaries, 1))
+    return f"""
+You are a compliance AI assistant for Australian councils.
+The following are summaries of consecutive sections of one policy document.
+Combine them into a single plain-English summary of the whole document (3-5 sentences).
+
+{sections}
+"""
+
+def ai_combine_summaries(summaries):
+    return complete(combine_prompt(summaries), **COMBINE_PARAMS)
+
+def ai_chat(query, context):
+    prompt = f"""
+You are a helpful AI compliance assistant. Here are the passages from the uploaded policies most relevant to the question:
+
+\"\"\"{context}\"\"\"
+
+Answer this council staff question using ONLY the info above. If unsure, say "Not specified in current policies."
+
+Question: {query}
+"""
+    return complete(prompt, temperature=0.2, max_tokens=400)
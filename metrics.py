@@ -0,0 +1,131 @@
+"""Timing, token and cost instrumentation for the hot paths.
+
+Spans are buffered in memory and written to the metrics table in batches, so
+recording one costs a list append. Call flush_metrics() at the end of a page
+run or job; the buffer also flushes itself once it fills up.
+
+Export for monitoring with: python metrics.py --hours 24 --format jsonl
+"""
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import func, insert, select
+from db import SessionLocal, WriteSession, engine, Metric, create_db
+
+# USD per million tokens (input, output); override with METRIC_PRICES='{"gpt-4o": [2.5, 10]}'
+PRICES = {"gpt-4o": (2.50, 10.00), "gpt-4o-mini": (0.15, 0.60), "text-embedding-3-small": (0.02, 0.0)}
+PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("METRIC_PRICES", "{}")).items()})
+FLUSH_SIZE = 100
+
+_buffer = []
+_buffer_lock = threading.Lock()
+# Council that spans without an explicit council are charged to (see council_scope)
+_council = contextvars.ContextVar("metrics_council", default=None)
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    input_price, output_price = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+@contextmanager
+def council_scope(council):
+    """Charge spans recorded in this block (ingestion, model calls) to council."""
+    token = _council.set(council)
+    try:
+        yield
+    finally:
+        _council.reset(token)
+
+def in_scope(fn):
+    """fn bound to the current council_scope, for handing to a thread pool."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def record(stage, duration_ms, council=None, model=None, prompt_tokens=0, completion_tokens=0, price_factor=1.0):
+    """Buffer one span; duration_ms None records tokens and cost only, kept out of stage_percentiles."""
+    row = {
+        "stage": stage,
+        "council": council or _council.get(),
+        "started_at": datetime.utcnow() - timedelta(milliseconds=duration_ms or 0),
+        "duration_ms": duration_ms,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens) * price_factor if model else 0.0
+    }
+    with _buffer_lock:
+        _buffer.append(row)
+        full = len(_buffer) >= FLUSH_SIZE
+    if full:
+        flush_metrics()
+
+@contextmanager
+def span(stage, council=None, **fields):
+    """Time a block; the yielded dict can be filled with model/token fields before it closes."""
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(stage, (time.perf_counter() - start) * 1000, council=council, **fields)
+
+def flush_metrics():
+    global _buffer
+    with _buffer_lock:
+        rows, _buffer = _buffer, []
+    if rows:
+        with WriteSession() as session:
+            session.execute(insert(Metric), rows)
+            session.commit()
+
+atexit.register(flush_metrics)
+
+def metrics_frame(since, council=None):
+    stmt = select(
+        Metric.stage, Metric.council, Metric.started_at, Metric.duration_ms, Metric.model,
+        Metric.prompt_tokens, Metric.completion_tokens, Metric.cost_usd
+    ).where(Metric.started_at >= since).order_by(Metric.started_at)
+    if council is not None:
+        stmt = stmt.where(Metric.council == council)
+    with engine.connect() as conn:
+        return pd.read_sql(stmt, conn)
+
+def stage_percentiles(frame, freq="D"):
+    """p50/p95 latency and call count per stage and time bucket."""
+    frame = frame.dropna(subset=["duration_ms"])
+    if frame.empty:
+        return pd.DataFrame(columns=["stage", "period", "count", "p50_ms", "p95_ms"])
+    grouped = frame.assign(period=pd.to_datetime(frame["started_at"]).dt.floor(freq)).groupby(["stage", "period"])["duration_ms"]
+    return pd.DataFrame({
+        "count": grouped.size(),
+        "p50_ms": grouped.quantile(0.5),
+        "p95_ms": grouped.quantile(0.95)
+    }).reset_index()
+
+def stage_count(stage, council=None):
+    with SessionLocal() as session:
+        query = session.query(func.count(Metric.id)).filter(Metric.stage == stage)
+        if council is not None:
+            query = query.filter(Metric.council == council)
+        return query.scalar()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export recorded metrics")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--format", choices=["jsonl", "csv", "percentiles"], default="jsonl")
+    args = parser.parse_args()
+    create_db()
+    frame = metrics_frame(datetime.utcnow() - timedelta(hours=args.hours))
+    if args.format == "csv":
+        frame.to_csv(sys.stdout, index=False)
+    elif args.format == "percentiles":
+        stage_percentiles(frame, freq="h").to_csv(sys.stdout, index=False)
+    else:
+        for row in frame.astype(object).where(frame.notna(), None).to_dict("records"):
+            print(json.dumps(row, default=str))
@@ -0,0 +1,152 @@
+"""PDF page text extraction, spread over a process pool.
+
+PdfPages splits a PDF into ranges of EXTRACT_PAGES_PER_TASK pages, extracts
+them in worker processes and yields the page texts in order as soon as each
+range is done, so callers can start on the first pages of a long policy while
+later ones are still being parsed. A page that takes longer than
+EXTRACT_PAGE_TIMEOUT seconds is given as empty text instead of stalling the
+upload.
+
+Only PyPDF2 is imported here, so pool workers start quickly.
+"""
+import io
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import PyPDF2
+
+PAGE_BREAK = "\f"
+# 0 means one process per CPU; 1 extracts in the calling thread (without per-page timeouts off the main thread)
+EXTRACT_PROCESSES = int(os.getenv("EXTRACT_PROCESSES", 0)) or os.cpu_count() or 1
+EXTRACT_PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", 8))
+# Seconds per page; 0 disables
+EXTRACT_PAGE_TIMEOUT = float(os.getenv("EXTRACT_PAGE_TIMEOUT", 30))
+
+# BaseException, so PyPDF2's own "except Exception" handlers don't swallow it
+class PageTimeout(BaseException):
+    pass
+
+def _on_alarm(signum, frame):
+    raise PageTimeout()
+
+def page_text(page, timeout=EXTRACT_PAGE_TIMEOUT):
+    """Text of one page; None if it took longer than timeout seconds.
+
+    The timeout uses SIGALRM, so it only applies on a process's main thread
+    (pool workers, command-line tools) on POSIX systems.
+    """
+    if not timeout or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        return (page.extract_text() or "").replace(PAGE_BREAK, " ")
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        return (page.extract_text() or "").replace(PAGE_BREAK, " ")
+    except PageTimeout:
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def page_texts(open_reader, start=0, stop=None, timeout=EXTRACT_PAGE_TIMEOUT):
+    """Yield page_text for pages start..stop of the reader open_reader() returns."""
+    reader = open_reader()
+    for i in range(start, len(reader.pages) if stop is None else stop):
+        text = page_text(reader.pages[i], timeout)
+        if text is None:
+            reader = open_reader()  # an interrupted read can leave the parser mid-object
+        yield text
+
+# Each worker keeps the file it is reading open, so consecutive ranges of one PDF don't reparse it
+_worker_reader = None
+
+def _open_worker_reader(path):
+    global _worker_reader
+    if _worker_reader is not None:
+        _worker_reader[1].close()
+    f = open(path, "rb")
+    _worker_reader = (path, f, PyPDF2.PdfReader(f))
+    return _worker_reader[2]
+
+def _extract_range(path, start, stop):
+    reader = _worker_reader[2] if _worker_reader is not None and _worker_reader[0] == path else _open_worker_reader(path)
+    readers = iter([reader])
+    return list(page_texts(lambda: next(readers, None) or _open_worker_reader(path), start, stop))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Callers are threaded (worker.py, Streamlit), which fork doesn't handle safely
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_PROCESSES, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+class PdfPages:
+    """Page texts of a PDF in order, extracted in the process pool while they are consumed.
+
+    len() is the page count. Pages that timed out come out as "" and their
+    (0-based) numbers are collected in timed_out. Iterate once, then close()
+    (or use the handle as a context manager) to remove the temporary file.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self._count = len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+        self._path = None
+        self.timed_out = []
+
+    def __len__(self):
+        return self._count
+
+    def _texts(self):
+        if EXTRACT_PROCESSES <= 1:
+            yield from page_texts(lambda: PyPDF2.PdfReader(io.BytesIO(self._data)))
+            return
+        # Workers read ranges from a file instead of each being sent the whole (up to 200 MB) upload
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(self._data)
+            self._path = f.name
+        pool = _get_pool()
+        futures = [
+            pool.submit(_extract_range, self._path, start, min(start + EXTRACT_PAGES_PER_TASK, self._count))
+            for start in range(0, self._count, EXTRACT_PAGES_PER_TASK)
+        ]
+        try:
+            for future in futures:
+                yield from future.result()
+        except BrokenProcessPool:
+            _reset_pool()  # a worker died (e.g. out of memory); the next file gets a fresh pool
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def __iter__(self):
+        for i, text in enumerate(self._texts()):
+            if text is None:
+                self.timed_out.append(i)
+                text = ""
+            yield text
+
+    def close(self):
+        if self._path:
+            os.remove(self._path)
+            self._path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
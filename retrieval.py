@@ -0,0 +1,153 @@
+import json
+import os
+import re
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from db import SessionLocal, WriteSession, PassageIndex
+from textstore import open_text
+
+PASSAGE_WORDS = 150
+TOP_K = int(os.getenv("CHAT_TOP_K", 8))
+# Roughly the 6000 characters ai_chat used to send
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", 1500))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = set("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+must shall should may all any each other such not no which who whom their they them been being
+""".split())
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+def split_passages(pages, words_per_passage=PASSAGE_WORDS):
+    passages = []
+    for page_no, page in enumerate(pages, 1):
+        words = page.split()
+        for start in range(0, len(words), words_per_passage):
+            passages.append({"page": page_no, "start": start, "text": " ".join(words[start:start + words_per_passage])})
+    return passages
+
+def passage_text(page, start, words_per_passage=PASSAGE_WORDS):
+    return " ".join(page.split()[start:start + words_per_passage])
+
+def build_doc_index(pages):
+    """Per-document index: passage locations plus a passage-by-term count matrix in CSR form.
+
+    Passage text isn't kept; it is read back from the text store for the hits that are used.
+    """
+    passages = split_passages(pages)
+    vocab = {}
+    indptr, term_ids, counts = [0], [], []
+    for passage in passages:
+        tf = {}
+        for token in tokenize(passage.pop("text")):
+            tf[token] = tf.get(token, 0) + 1
+        for token, count in tf.items():
+            term_ids.append(vocab.setdefault(token, len(vocab)))
+            counts.append(count)
+        indptr.append(len(term_ids))
+    return {
+        "passages": passages,
+        "vocab": list(vocab),
+        "indptr": indptr,
+        "term_ids": term_ids,
+        "counts": counts
+    }
+
+def save_doc_index(sha256, doc_index):
+    with WriteSession() as session:
+        try:
+            with session.begin_nested():
+                session.merge(PassageIndex(sha256=sha256, data=json.dumps(doc_index)))
+        except IntegrityError:
+            pass  # indexed concurrently
+        session.commit()
+
+def has_doc_index(sha256):
+    with SessionLocal() as session:
+        return session.query(PassageIndex.sha256).filter(PassageIndex.sha256 == sha256).first() is not None
+
+def load_doc_indexes(sha256s):
+    with SessionLocal() as session:
+        rows = session.query(PassageIndex).filter(PassageIndex.sha256.in_(list(sha256s))).all()
+        return {row.sha256: json.loads(row.data) for row in rows}
+
+class PolicyIndex:
+    """BM25 over the passages of many documents.
+
+    Per-document CSR matrices are merged into one term-sorted postings list so
+    a query is a few NumPy slices and a scatter-add, independent of how the
+    passages are spread across documents.
+    """
+
+    def __init__(self, docs):
+        # docs: iterable of (name, sha256, doc_index); passages are (name, sha256, page, start word, text)
+        # where text is only set for indexes built before passage text moved to the text store
+        self.passages = []
+        vocab = {}
+        passage_ids, term_ids, counts = [], [], []
+        for name, sha256, doc in docs:
+            base = len(self.passages)
+            self.passages.extend((name, sha256, p["page"], p.get("start", 0), p.get("text")) for p in doc["passages"])
+            remap = np.array([vocab.setdefault(t, len(vocab)) for t in doc["vocab"]], dtype=np.int64)
+            indptr = np.asarray(doc["indptr"], dtype=np.int64)
+            passage_ids.append(base + np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)))
+            term_ids.append(remap[np.asarray(doc["term_ids"], dtype=np.int64)] if len(remap) else np.zeros(0, np.int64))
+            counts.append(np.asarray(doc["counts"], dtype=np.float32))
+        self.vocab = vocab
+        passage_ids = np.concatenate(passage_ids) if passage_ids else np.zeros(0, np.int64)
+        term_ids = np.concatenate(term_ids) if term_ids else np.zeros(0, np.int64)
+        counts = np.concatenate(counts) if counts else np.zeros(0, np.float32)
+
+        order = np.argsort(term_ids, kind="stable")
+        self.post_passages = passage_ids[order]
+        self.post_counts = counts[order]
+        self.term_starts = np.searchsorted(term_ids[order], np.arange(len(vocab) + 1))
+
+        lengths = np.bincount(passage_ids, weights=counts, minlength=len(self.passages)).astype(np.float32)
+        avgdl = lengths.mean() if len(lengths) else 1.0
+        self.norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(avgdl, 1e-9))
+
+    def search(self, query, k=TOP_K):
+        n = len(self.passages)
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_starts[term_id], self.term_starts[term_id + 1]
+            ids, tf = self.post_passages[start:end], self.post_counts[start:end]
+            idf = np.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * tf * (BM25_K1 + 1) / (tf + self.norm[ids])
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(self.passages[i], float(scores[i])) for i in hits]
+
+    def context(self, query, max_tokens=CHAT_CONTEXT_TOKENS, k=TOP_K):
+        """Top passages for query, labelled by source, trimmed to the token budget.
+
+        Only the stored pages holding those passages are read and decompressed.
+        """
+        parts, used, handles = [], 0, {}
+        try:
+            for (name, sha256, page, start, text), _ in self.search(query, k):
+                if text is None:
+                    if sha256 not in handles:
+                        handles[sha256] = open_text(sha256)
+                    if handles[sha256] is None:
+                        continue  # text missing from the store (e.g. a database restored without it)
+                    text = passage_text(handles[sha256][page - 1], start)
+                tokens = len(text) // 4
+                if parts and used + tokens > max_tokens:
+                    break
+                parts.append(f"[{name}, page {page}]\n{text}")
+                used += tokens
+        finally:
+            for handle in handles.values():
+                if handle is not None:
+                    handle.close()
+        return "\n\n".join(parts)
@@ -0,0 +1,70 @@
+import html
+import re
+from sqlalchemy import text
+from db import engine, write_engine
+
+# search_index is the FTS5 table created by db.create_db()
+SEARCH_PAGE_SIZE = 20
+
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+
+def index_search_document(sha256, result, pages):
+    """Replace the indexed summary, obligations and page text for one document."""
+    rows = [{"sha256": sha256, "kind": "summary", "ref": 0, "body": result["summary"]}]
+    rows += [{"sha256": sha256, "kind": "obligation", "ref": i, "body": obl["text"]} for i, obl in enumerate(result["obligations"])]
+    rows += [{"sha256": sha256, "kind": "page", "ref": i, "body": page} for i, page in enumerate(pages, 1) if page.strip()]
+    # FTS5 reads its shadow tables before writing, so the write lock is taken up front
+    with write_engine.begin() as conn:
+        conn.execute(text("DELETE FROM search_index WHERE sha256 = :sha256"), {"sha256": sha256})
+        conn.execute(text("INSERT INTO search_index (sha256, kind, ref, body) VALUES (:sha256, :kind, :ref, :body)"), rows)
+
+def fts_query(search_text):
+    # Quote every term so user input can't inject FTS syntax; prefix-match the last one while typing
+    terms = re.findall(r"\w+", search_text)
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def _in_clause(sha256s):
+    params = {f"s{i}": sha for i, sha in enumerate(sha256s)}
+    return ", ".join(f":{name}" for name in params), params
+
+def search_policies(search_text, sha256s, page=1, page_size=SEARCH_PAGE_SIZE):
+    """Ranked hits across summaries, obligations and page text of the given documents.
+
+    Returns (total, hits); each hit has sha256, kind, ref and an HTML-safe snippet
+    with matches wrapped in <mark>.
+    """
+    query = fts_query(search_text)
+    if not query or not sha256s:
+        return 0, []
+    placeholders, params = _in_clause(sha256s)
+    params.update(query=query, limit=page_size, offset=(page - 1) * page_size)
+    where = f"search_index MATCH :query AND sha256 IN ({placeholders})"
+    with engine.connect() as conn:
+        total = conn.execute(text(f"SELECT COUNT(*) FROM search_index WHERE {where}"), params).scalar()
+        rows = conn.execute(text(
+            f"SELECT sha256, kind, ref, snippet(search_index, 3, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', 16) "
+            f"FROM search_index WHERE {where} ORDER BY bm25(search_index) LIMIT :limit OFFSET :offset"
+        ), params).all()
+    hits = []
+    for sha256, kind, ref, snippet in rows:
+        snippet = html.escape(snippet).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+        hits.append({"sha256": sha256, "kind": kind, "ref": int(ref), "snippet": snippet})
+    return total, hits
+
+def matching_obligations(search_text, sha256s):
+    """Set of (sha256, obligation index) whose own text matches search_text."""
+    query = fts_query(search_text)
+    if not query or not sha256s:
+        return set()
+    placeholders, params = _in_clause(sha256s)
+    params["query"] = query
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            f"SELECT sha256, ref FROM search_index "
+            f"WHERE search_index MATCH :query AND kind = 'obligation' AND sha256 IN ({placeholders})"
+        ), params).all()
+    return {(sha256, int(ref)) for sha256, ref in rows}
@@ -0,0 +1,188 @@
+from datetime import date, datetime
+import pandas as pd
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from db import SessionLocal, WriteSession, engine, PolicyDoc, Obligation, AuditLog, DataVersion
+from deadlines import describe_deadline
+from clusters import embed_obligations, assign_clusters
+
+# Persistent replacement for the per-session obligations / audit_log dicts.
+# Everything is scoped by council so several councils can share one database.
+
+def _bump_version(session, council):
+    updated = session.query(DataVersion).filter(DataVersion.council == council).update(
+        {"version": DataVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        try:
+            with session.begin_nested():
+                session.add(DataVersion(council=council, version=1))
+        except IntegrityError:
+            session.query(DataVersion).filter(DataVersion.council == council).update(
+                {"version": DataVersion.version + 1}, synchronize_session=False
+            )
+
+def data_version(council):
+    """Counter that changes whenever the council's documents, obligations or audit log change."""
+    with SessionLocal() as session:
+        row = session.get(DataVersion, council)
+        return row.version if row else 0
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+def obligation_rows(doc_id, obligations):
+    return [{
+        "doc_id": doc_id,
+        "position": i,
+        "text": obl["text"],
+        "deadline": describe_deadline(obl.get("deadline", ""), obl.get("recurrence", "")),
+        "responsible": obl.get("responsible", ""),
+        "cluster_id": None,
+        "due_date": _as_date(obl.get("due_date")),
+        "recurrence_days": obl.get("recurrence_days"),
+        "assigned_to": obl.get("assigned_to", ""),
+        "done": obl.get("done", False),
+        "timestamp": obl.get("timestamp")
+    } for i, obl in enumerate(obligations)]
+
+def save_documents(council, items, who="You"):
+    """Store summarized documents in one transaction; items are (filename, sha256, result).
+
+    Obligations and upload audit rows are bulk-inserted, with new obligations
+    added to the council's clusters of similar obligations. A document already
+    stored under the same council, filename and content is not stored again,
+    so retried ingestion doesn't duplicate it. Returns the document ids in order.
+    """
+    with WriteSession() as session:
+        existing = dict(
+            ((filename, sha256), doc_id) for doc_id, filename, sha256 in
+            session.query(PolicyDoc.id, PolicyDoc.filename, PolicyDoc.sha256).filter(
+                PolicyDoc.council == council, PolicyDoc.filename.in_([filename for filename, _, _ in items])
+            )
+        )
+        now = datetime.now()
+        doc_ids, obligations, audits = [], [], []
+        for filename, sha256, result in items:
+            doc_id = existing.get((filename, sha256))
+            if doc_id is None:
+                doc = PolicyDoc(council=council, filename=filename, sha256=sha256, summary=result["summary"], upload_time=now)
+                session.add(doc)
+                session.flush()
+                doc_id = existing[(filename, sha256)] = doc.id
+                obligations += obligation_rows(doc_id, result["obligations"])
+                audits.append({"council": council, "action": "upload", "filename": filename, "obligation": "", "who": who, "time": now})
+            doc_ids.append(doc_id)
+        if obligations:
+            assign_clusters(session, council, obligations)
+            session.execute(insert(Obligation), obligations)
+        if audits:
+            session.execute(insert(AuditLog), audits)
+            _bump_version(session, council)
+        session.commit()
+        return doc_ids
+
+def save_document(council, filename, sha256, result, who="You"):
+    """Store one summarized document; see save_documents."""
+    return save_documents(council, [(filename, sha256, result)], who)[0]
+
+def cluster_unclustered():
+    """Cluster obligations stored without a cluster (before clustering existed, or when embedding failed).
+
+    Returns the number of obligations assigned.
+    """
+    with SessionLocal() as session:
+        rows = (
+            session.query(Obligation.id, Obligation.text, PolicyDoc.council)
+            .join(PolicyDoc, Obligation.doc_id == PolicyDoc.id)
+            .filter(Obligation.cluster_id.is_(None))
+            .order_by(PolicyDoc.upload_time, PolicyDoc.id, Obligation.position)
+            .all()
+        )
+    if not rows:
+        return 0
+    embed_obligations(list({text for _, text, _ in rows if text}))
+    by_council = {}
+    for obligation_id, text, council in rows:
+        by_council.setdefault(council, []).append({"id": obligation_id, "text": text})
+    assigned = 0
+    with WriteSession() as session:
+        for council, items in by_council.items():
+            assign_clusters(session, council, items)
+            updates = [{"id": item["id"], "cluster_id": item["cluster_id"]} for item in items if "cluster_id" in item]
+            if updates:
+                session.execute(update(Obligation), updates)
+                _bump_version(session, council)
+                assigned += len(updates)
+        session.commit()
+    return assigned
+
+def document_names(council):
+    with SessionLocal() as session:
+        return {name for (name,) in session.query(PolicyDoc.filename).filter(PolicyDoc.council == council)}
+
+def document_keys(council):
+    """(filename, sha256) of every stored document; a revised file under a known name is a new key."""
+    with SessionLocal() as session:
+        return set(session.query(PolicyDoc.filename, PolicyDoc.sha256).filter(PolicyDoc.council == council).tuples())
+
+def list_documents(council, limit=None):
+    """Documents newest first, as plain dicts."""
+    with SessionLocal() as session:
+        query = (
+            session.query(PolicyDoc.id, PolicyDoc.filename, PolicyDoc.sha256, PolicyDoc.summary, PolicyDoc.upload_time)
+            .filter(PolicyDoc.council == council)
+            .order_by(PolicyDoc.upload_time.desc(), PolicyDoc.id.desc())
+        )
+        if limit:
+            query = query.limit(limit)
+        return [row._asdict() for row in query]
+
+def obligation_frame(council):
+    """All obligations for the council, one row each, with datetime64 due dates."""
+    stmt = (
+        select(
+            Obligation.id, Obligation.doc_id, PolicyDoc.filename.label("file"), Obligation.position.label("idx"),
+            Obligation.text, Obligation.deadline, Obligation.responsible, Obligation.due_date.label("due"), Obligation.recurrence_days,
+            Obligation.cluster_id,
+            Obligation.assigned_to, Obligation.done, Obligation.timestamp
+        )
+        .join(PolicyDoc, Obligation.doc_id == PolicyDoc.id)
+        .where(PolicyDoc.council == council)
+        .order_by(PolicyDoc.upload_time, PolicyDoc.id, Obligation.position)
+    )
+    with engine.connect() as conn:
+        frame = pd.read_sql(stmt, conn)
+    frame["due"] = pd.to_datetime(frame["due"], errors="coerce")
+    frame["recurrence_days"] = pd.to_numeric(frame["recurrence_days"], errors="coerce")
+    frame["done"] = frame["done"].fillna(False).astype(bool)
+    frame["assigned_to"] = frame["assigned_to"].fillna("")
+    frame["responsible"] = frame["responsible"].fillna("")
+    return frame
+
+def _audit_select(council):
+    return (
+        select(AuditLog.action, AuditLog.filename.label("file"), AuditLog.obligation, AuditLog.who, AuditLog.time)
+        .where(AuditLog.council == council)
+        .order_by(AuditLog.time, AuditLog.id)
+    )
+
+def _format_audit(frame):
+    frame["time"] = pd.to_datetime(frame["time"]).dt.strftime("%Y-%m-%d %H:%M")
+    return frame
+
+def audit_frame(council):
+    with engine.connect() as conn:
+        return _format_audit(pd.read_sql(_audit_select(council), conn))
+
+def audit_chunks(council, chunksize):
+    """Yield the audit log as DataFrames of at most chunksize rows (at least one, possibly empty)."""
+    with engine.connect() as conn:
+        empty = True
+        for frame in pd.read_sql(_audit_select(council), conn, chunksize=chunksize):
+            empty = False
+            yield _format_audit(frame)
+        if empty:
+            yield _format_audit(pd.read_sql(_audit_select(council).limit(0), conn))
@@ -0,0 +1,133 @@
+"""Local stand-in for the OpenAI chat-completions and embeddings endpoints.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8009/v1 to exercise
+ingestion without network access or token cost. Latency and a failure rate
+(returned as 429 or 503) are configurable so retry and rate-limit handling can
+be checked.
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Reply to requests with a JSON response_format (summarization); anything else gets STUB_TEXT_REPLY
+STUB_REPLY = json.dumps({
+    "summary": "This policy sets out council responsibilities for records, privacy and reporting.",
+    "obligations": [
+        {"text": "Review the policy", "deadline": "", "responsible": "Governance team", "recurrence": "every year"},
+        {"text": "Report privacy breaches", "deadline": "within 30 days", "responsible": "Privacy Officer", "recurrence": ""},
+        {"text": "Complete staff training", "deadline": "by 30 June 2026", "responsible": "People & Culture", "recurrence": ""}
+    ]
+})
+STUB_TEXT_REPLY = "This policy sets out council responsibilities for records, privacy and reporting."
+STUB_EMBEDDING_DIM = 256
+
+def stub_embedding(text, dim=STUB_EMBEDDING_DIM):
+    """Hashed bag-of-words vector, so texts sharing most words come out similar."""
+    vector = [0.0] * dim
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        vector[zlib.crc32(word.encode("utf-8")) % dim] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fail_rate = 0.0
+    reply = STUB_REPLY
+    text_reply = STUB_TEXT_REPLY
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.rstrip("/")
+        if not path.endswith(("/chat/completions", "/embeddings")):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            status = random.choice([429, 503])
+            self._send(status, {"error": {"message": "stub failure", "type": "stub"}}, {"retry-after": "0"})
+            return
+        if path.endswith("/embeddings"):
+            self._embeddings(request)
+            return
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        reply = self.reply if request.get("response_format") else self.text_reply
+        completion_tokens = len(reply) // 4
+        self._send(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": completion_tokens,
+                "total_tokens": len(prompt) // 4 + completion_tokens
+            }
+        })
+
+    def _embeddings(self, request):
+        texts = request.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        data = []
+        for i, text in enumerate(texts):
+            vector = stub_embedding(text)
+            if request.get("encoding_format") == "base64":
+                vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = sum(len(text) // 4 for text in texts)
+        self._send(200, {
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+def start_stub(port=0, latency=0.0, fail_rate=0.0):
+    """Serve the stub on a background thread; returns the server (call .shutdown() to stop)."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"latency": latency, "fail_rate": fail_rate})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def stub_base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the OpenAI chat-completions and embeddings APIs")
+    parser.add_argument("--port", type=int, default=8009)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds to wait before each reply")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 429/503")
+    args = parser.parse_args()
+    server = start_stub(args.port, args.latency, args.fail_rate)
+    print(f"Stub OpenAI endpoint at {stub_base_url(server)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
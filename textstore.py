@@ -0,0 +1,96 @@
+"""Compressed on-disk store for extracted page text.
+
+Each document (keyed by the SHA-256 of its file) is two files under
+TEXT_STORE_DIR:
+
+    <sha>.pages  zlib-compressed pages, one block per page, back to back
+    <sha>.idx    little-endian uint64 block offsets (pages + 1 of them)
+
+Both are memory-mapped for reads, so reading a page decompresses only that
+block and callers hold a small DocumentText handle instead of the full text.
+"""
+import mmap
+import os
+import threading
+import zlib
+import numpy as np
+
+TEXT_STORE_DIR = os.getenv("TEXT_STORE_DIR", "textstore")
+TEXT_COMPRESS_LEVEL = int(os.getenv("TEXT_COMPRESS_LEVEL", 6))
+
+def _paths(sha256):
+    directory = os.path.join(TEXT_STORE_DIR, sha256[:2])
+    return os.path.join(directory, f"{sha256}.pages"), os.path.join(directory, f"{sha256}.idx")
+
+def has_text(sha256):
+    # The index is written last, so its presence means the document is complete
+    return os.path.exists(_paths(sha256)[1])
+
+def write_pages(sha256, pages):
+    data_path, index_path = _paths(sha256)
+    if os.path.exists(index_path):
+        return
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    offsets = [0]
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(data_path + suffix, "wb") as f:
+        for page in pages:
+            block = zlib.compress(page.encode("utf-8"), TEXT_COMPRESS_LEVEL)
+            f.write(block)
+            offsets.append(offsets[-1] + len(block))
+    np.asarray(offsets, dtype="<u8").tofile(index_path + suffix)
+    os.replace(data_path + suffix, data_path)
+    os.replace(index_path + suffix, index_path)
+
+class DocumentText:
+    """Read-only, list-like view of a stored document's pages (0-based).
+
+    Files are mapped on first access and released by close() (or by using the
+    handle as a context manager).
+    """
+
+    def __init__(self, sha256):
+        self.sha256 = sha256
+        self._offsets = None
+        self._data = None
+
+    def _open(self):
+        if self._offsets is None:
+            data_path, index_path = _paths(self.sha256)
+            self._offsets = np.memmap(index_path, dtype="<u8", mode="r")
+            with open(data_path, "rb") as f:
+                # mmap can't map an empty file (a document with no pages)
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __len__(self):
+        self._open()
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        self._open()
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return zlib.decompress(self._data[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._offsets = self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_text(sha256):
+    """Handle on a stored document, or None if it hasn't been stored."""
+    return DocumentText(sha256) if has_text(sha256) else None
@@ -0,0 +1,75 @@
+"""Background ingestion worker.
+
+Run alongside the Streamlit app (python worker.py). It claims queued jobs from
+the jobs table, processes them with the same pipeline the page used to run
+inline, and stores the results. Jobs left running by a worker that died are
+requeued once their heartbeat goes stale.
+"""
+import argparse
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from db import create_db
+from ingest import process_file, INGEST_CONCURRENCY
+from jobs import claim_job, update_progress, heartbeat, complete_job, fail_job, requeue_stale_jobs, read_upload
+from store import save_document, cluster_unclustered
+from metrics import flush_metrics, council_scope
+
+POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", 2))
+# Obligations saved without a cluster (e.g. the embeddings endpoint was down) are grouped this often
+CLUSTER_INTERVAL_SECONDS = float(os.getenv("WORKER_CLUSTER_INTERVAL_SECONDS", 300))
+
+def run_job(job):
+    with council_scope(job.council):
+        try:
+            data = read_upload(job.sha256)
+            result = process_file(data, lambda fraction, message: update_progress(job.id, fraction, message))
+            doc_id = save_document(job.council, job.filename, result["sha256"], result)
+            complete_job(job.id, doc_id)
+        except Exception as e:
+            fail_job(job.id, e)
+        finally:
+            flush_metrics()
+
+def group_unclustered():
+    try:
+        clustered = cluster_unclustered()
+        if clustered:
+            print(f"Grouped {clustered} obligation(s) with similar ones", flush=True)
+    except Exception as e:
+        print(f"Could not group obligations: {e}", flush=True)
+
+def run_worker(concurrency=INGEST_CONCURRENCY, once=False):
+    """Process jobs until interrupted, or until the queue is empty when once is set."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    create_db()
+    # Grouping runs on its own thread so a slow embeddings endpoint doesn't hold up heartbeats
+    with ThreadPoolExecutor(max_workers=concurrency) as pool, ThreadPoolExecutor(max_workers=1) as background:
+        grouping = background.submit(group_unclustered)
+        last_grouping = time.monotonic()
+        running = set()
+        while True:
+            if grouping.done() and time.monotonic() - last_grouping >= CLUSTER_INTERVAL_SECONDS:
+                grouping = background.submit(group_unclustered)
+                last_grouping = time.monotonic()
+            requeue_stale_jobs()
+            while len(running) < concurrency:
+                job = claim_job(worker_id)
+                if job is None:
+                    break
+                running.add(pool.submit(run_job, job))
+            if not running:
+                if once:
+                    return
+                time.sleep(POLL_SECONDS)
+                continue
+            _, running = wait(running, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            heartbeat(worker_id)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PolicySimplify AI ingestion worker")
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY)
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+    run_worker(args.concurrency, args.once)